@@ -0,0 +1,844 @@
+"""Benchmarks for the V2EX client against a local stand-in API.
+
+Usage:
+    uv run python bench.py fanout --latency 0.05 --pages 1 5 10 20
+    uv run python bench.py pool --topics 10 --pages 3
+    uv run python bench.py cache --pages 5 --runs 3
+    uv run python bench.py ratelimit --limit 40 --window 3 --topics 8
+    uv run python bench.py tail --requests 300
+    uv run python bench.py bundle --pages 1 2 5
+    uv run python bench.py parse --replies 100
+    uv run python bench.py memory --replies 10000
+    uv run python bench.py intern --replies 10000
+    uv run python bench.py projection --replies 10000
+    uv run python bench.py stream --per-page 2000
+    uv run python bench.py spool --replies 5000
+    uv run python bench.py format --replies 1000 10000
+    uv run python bench.py inline --ttft 0.8 --pages 1 5
+    uv run python bench.py sections --ttft 0.8 --chunk-delay 0.02
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import multiprocessing
+import os
+import random
+import re
+import tempfile
+import threading
+import time
+import tracemalloc
+from collections.abc import Iterator
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Optional
+from urllib.parse import parse_qs, urlparse
+
+import httpx
+
+from v2ex import (
+    ApiResponse,
+    AsyncV2EXClient,
+    InternPool,
+    RepliesResponse,
+    ReplyBatch,
+    Topic,
+    V2EXClient,
+    _decode,
+    _parse_replies_response,
+    _pick_first,
+    _truncate,
+)
+from v2ex_cache import ResponseCache
+from v2ex_ratelimit import RateLimiter
+from v2ex_retry import RetryPolicy
+
+PER_PAGE = 20
+
+
+def make_reply(reply_id: int) -> dict[str, Any]:
+    member_id = reply_id % 97
+    return {
+        "id": reply_id,
+        "content": f"回复内容 {reply_id} " * 8,
+        "content_rendered": f"<p>回复内容 {reply_id}</p>" * 8,
+        "created": 1700000000 + reply_id,
+        "member": {
+            "id": member_id,
+            "username": f"user{member_id}",
+            "url": f"https://www.v2ex.com/member/user{member_id}",
+            "avatar": f"https://cdn.v2ex.com/avatar/{member_id}.png",
+            "bio": "",
+            "website": "",
+            "created": 1500000000,
+        },
+    }
+
+
+def make_topic(topic_id: int, replies: int) -> dict[str, Any]:
+    return {
+        "id": topic_id,
+        "title": f"Stand-in topic {topic_id}",
+        "content": "主题内容 " * 50,
+        "content_rendered": "<p>主题内容</p>" * 50,
+        "url": f"https://www.v2ex.com/t/{topic_id}",
+        "replies": replies,
+        "created": 1700000000,
+        "last_touched": 1700000000 + replies,
+        "last_modified": 1700000000,
+        "member": {"id": 1, "username": "author"},
+        "node": {"id": 1, "name": "qna", "title": "问与答"},
+    }
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    server: "StandInServer"
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+    def do_HEAD(self) -> None:
+        # preconnect() opens its connection with a HEAD of the host root.
+        self.send_response(200)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def do_GET(self) -> None:
+        url = urlparse(self.path)
+        parts = url.path.rstrip("/").split("/")
+        time.sleep(self.server.latency)
+        if random.random() < self.server.slow_rate:
+            time.sleep(self.server.slow_latency)
+        self.server.requests += 1
+        if random.random() < self.server.error_rate:
+            self.send_json(503, {"success": False, "message": "Service unavailable"})
+            return
+        if not self.server.take_quota():
+            self.server.throttled += 1
+            self.send_json(429, {"success": False, "message": "Rate limit exceeded"})
+            return
+        if len(parts) >= 2 and parts[-1] == "replies":
+            topic_id = int(parts[-2])
+            page = int(parse_qs(url.query).get("p", ["1"])[0])
+            total = self.server.replies
+            per_page = self.server.per_page
+            start = (page - 1) * per_page
+            end = min(start + per_page, total)
+            body: dict[str, Any] = {
+                "success": True,
+                "message": "",
+                "result": [make_reply(topic_id * 100000 + idx) for idx in range(start, end)],
+                "pagination": {
+                    "per_page": per_page,
+                    "total": total,
+                    "pages": max(1, -(-total // per_page)),
+                },
+            }
+        elif len(parts) >= 2 and parts[-2] == "topics":
+            topic_id = int(parts[-1])
+            body = {"success": True, "message": "", "result": make_topic(topic_id, self.server.replies)}
+        else:
+            self.send_json(404, {"success": False, "message": "Not found"})
+            return
+        self.send_json(200, body)
+
+    def send_json(self, status: int, body: dict[str, Any]) -> None:
+        data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        etag = f'"{hashlib.sha1(data).hexdigest()}"'
+        if status == 200 and self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        self.send_response(status)
+        for name, value in self.server.quota_headers().items():
+            self.send_header(name, value)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.send_header("ETag", etag)
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class StandInServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128
+
+    def __init__(self, latency: float, replies: int) -> None:
+        super().__init__(("127.0.0.1", 0), StandInHandler)
+        self.latency = latency
+        self.replies = replies
+        self.per_page = PER_PAGE
+        self.requests = 0
+        self.throttled = 0
+        self.slow_rate = 0.0
+        self.slow_latency = 0.0
+        self.error_rate = 0.0
+        self.rate_limit: Optional[int] = None
+        self.rate_window = 3600
+        self._quota_lock = threading.Lock()
+        self._window_reset = 0
+        self._window_used = 0
+
+    def _roll_window(self) -> None:
+        now = int(time.time())
+        if now >= self._window_reset:
+            self._window_reset = now + self.rate_window
+            self._window_used = 0
+
+    def take_quota(self) -> bool:
+        if self.rate_limit is None:
+            return True
+        with self._quota_lock:
+            self._roll_window()
+            if self._window_used >= self.rate_limit:
+                return False
+            self._window_used += 1
+            return True
+
+    def quota_headers(self) -> dict[str, str]:
+        if self.rate_limit is None:
+            return {}
+        with self._quota_lock:
+            self._roll_window()
+            return {
+                "X-Rate-Limit-Limit": str(self.rate_limit),
+                "X-Rate-Limit-Remaining": str(self.rate_limit - self._window_used),
+                "X-Rate-Limit-Reset": str(self._window_reset),
+            }
+
+    def handle_error(self, request: Any, client_address: Any) -> None:
+        # Cancelled hedges and retries hang up early; that is expected here.
+        pass
+
+    @property
+    def api_base(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host!s}:{port}/api/v2"
+
+
+@contextmanager
+def stand_in_api(latency: float, replies: int) -> Iterator[StandInServer]:
+    server = StandInServer(latency, replies)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield server
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def bench_fanout(args: argparse.Namespace) -> None:
+    print(f"latency={args.latency:.3f}s concurrency={args.concurrency}")
+    print(f"{'pages':>6} {'serial_s':>10} {'fanout_s':>10} {'speedup':>8}")
+    for pages in args.pages:
+        with stand_in_api(args.latency, pages * PER_PAGE) as server:
+            timings = []
+            for concurrency in (1, args.concurrency):
+                client = V2EXClient("bench", api_base=server.api_base, max_concurrency=concurrency)
+                started = time.perf_counter()
+                client.build_bundle(1, max_pages=pages)
+                timings.append(time.perf_counter() - started)
+        serial, fanout = timings
+        print(f"{pages:>6} {serial:>10.3f} {fanout:>10.3f} {serial / fanout:>7.1f}x")
+
+
+def bench_pool(args: argparse.Namespace) -> None:
+    topic_ids = list(range(1, args.topics + 1))
+    with stand_in_api(args.latency, args.pages * PER_PAGE) as server:
+        with V2EXClient("bench", api_base=server.api_base) as client:
+            client.preconnect()
+            started = time.perf_counter()
+            for topic_id in topic_ids:
+                client.build_bundle(topic_id, max_pages=args.pages)
+            elapsed = time.perf_counter() - started
+    print(f"topics={args.topics} pages={args.pages} elapsed={elapsed:.3f}s")
+    print(client.connection_stats.summary())
+
+
+def bench_cache(args: argparse.Namespace) -> None:
+    with stand_in_api(args.latency, args.pages * PER_PAGE) as server, tempfile.TemporaryDirectory() as tmp:
+        for label, ttl in (("fresh", 3600.0), ("revalidate", 0.0)):
+            cache = ResponseCache(f"{tmp}/{label}.sqlite3", ttl=ttl)
+            with V2EXClient("bench", api_base=server.api_base, cache=cache) as client:
+                for run in range(args.runs):
+                    started = time.perf_counter()
+                    client.build_bundle(1, max_pages=args.pages)
+                    elapsed = time.perf_counter() - started
+                    print(f"{label:>10} run={run} elapsed={elapsed:.3f}s")
+            print(f"{label:>10} {cache.stats.summary()}")
+            cache.close()
+
+
+def bench_ratelimit(args: argparse.Namespace) -> None:
+    with stand_in_api(args.latency, args.pages * PER_PAGE) as server:
+        server.rate_limit = args.limit
+        server.rate_window = args.window
+        limiter = RateLimiter(limit=args.limit, window=args.window)
+        with V2EXClient("bench", api_base=server.api_base, rate_limiter=limiter) as client:
+            started = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=args.topics) as executor:
+                list(executor.map(lambda topic_id: client.build_bundle(topic_id, args.pages), range(1, args.topics + 1)))
+            elapsed = time.perf_counter() - started
+        print(f"requests={server.requests} server_429={server.throttled} elapsed={elapsed:.2f}s")
+        print(limiter.quota().summary())
+
+
+def bench_tail(args: argparse.Namespace) -> None:
+    random.seed(args.seed)
+    print(
+        f"latency={args.latency}s slow_rate={args.slow_rate} slow_latency={args.slow_latency}s "
+        f"error_rate={args.error_rate}"
+    )
+    policies = {
+        "no-retry": RetryPolicy(max_attempts=1),
+        "retry": RetryPolicy(backoff_base=0.01),
+        "retry+hedge": RetryPolicy(backoff_base=0.01, hedge_quantile=0.95),
+    }
+    for label, policy in policies.items():
+        with stand_in_api(args.latency, args.pages * PER_PAGE) as server:
+            server.slow_rate = args.slow_rate
+            server.slow_latency = args.slow_latency
+            server.error_rate = args.error_rate
+            with V2EXClient("bench", api_base=server.api_base, retry_policy=policy) as client:
+                failed = 0
+                for _ in range(args.requests):
+                    try:
+                        client.fetch_replies_page(1, random.randint(1, args.pages))
+                    except Exception:
+                        failed += 1
+                print(f"{label:>12} failed={failed} {client.attempt_log.summary()}")
+
+
+def bench_bundle(args: argparse.Namespace) -> None:
+    print(f"latency={args.latency:.3f}s")
+    print(f"{'pages':>6} {'serial_s':>10} {'parallel_s':>10}")
+    for pages in args.pages:
+        with stand_in_api(args.latency, pages * PER_PAGE) as server:
+            with V2EXClient("bench", api_base=server.api_base) as client:
+                client.preconnect()
+                started = time.perf_counter()
+                topic = client.fetch_topic(1)
+                client.fetch_replies(1, pages, None, total_replies=topic.replies)
+                serial = time.perf_counter() - started
+                started = time.perf_counter()
+                client.fetch_bundle(2, pages)
+                parallel = time.perf_counter() - started
+        print(f"{pages:>6} {serial:>10.3f} {parallel:>10.3f}")
+
+
+def replies_page_body(replies: int, start: int = 0) -> bytes:
+    body = {
+        "success": True,
+        "message": "",
+        "result": [make_reply(idx) for idx in range(start, start + replies)],
+        "pagination": {"per_page": replies, "total": replies, "pages": 1},
+    }
+    return json.dumps(body, ensure_ascii=False).encode("utf-8")
+
+
+def _legacy_parse(body: bytes) -> RepliesResponse:
+    payload = json.loads(body)
+    ApiResponse.model_validate(payload)
+    return RepliesResponse.model_validate(payload)
+
+
+def _timeit(fn: Any, rounds: int) -> float:
+    started = time.perf_counter()
+    for _ in range(rounds):
+        fn()
+    return (time.perf_counter() - started) / rounds
+
+
+def bench_parse(args: argparse.Namespace) -> None:
+    body = replies_page_body(args.replies)
+    print(f"page={args.replies} replies, {len(body) / 1024:.1f} KiB, rounds={args.rounds}")
+    legacy = _timeit(lambda: _legacy_parse(body), args.rounds)
+    single = _timeit(lambda: _decode(RepliesResponse, body), args.rounds)
+    print(f"{'json+2x validate':>18} {legacy * 1e6:>9.1f} us/page")
+    print(f"{'validate_json':>18} {single * 1e6:>9.1f} us/page  ({legacy / single:.2f}x)")
+
+
+def _retained(build: Any) -> tuple[Any, int, float]:
+    tracemalloc.start()
+    started = time.perf_counter()
+    value = build()
+    elapsed = time.perf_counter() - started
+    retained, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return value, retained, elapsed
+
+
+def bench_memory(args: argparse.Namespace) -> None:
+    bodies = [replies_page_body(PER_PAGE, start) for start in range(0, args.replies, PER_PAGE)]
+
+    def as_list() -> list[Any]:
+        replies: list[Any] = []
+        for body in bodies:
+            replies.extend(_decode(RepliesResponse, body).result)
+        return replies
+
+    def as_batch() -> ReplyBatch:
+        batch = ReplyBatch()
+        for body in bodies:
+            batch.extend(_decode(RepliesResponse, body).result)
+        return batch
+
+    client = V2EXClient("bench")
+    try:
+        replies, list_bytes, list_build = _retained(as_list)
+        started = time.perf_counter()
+        list_text = client.format_replies(replies, None)
+        list_format = time.perf_counter() - started
+        del replies
+        batch, batch_bytes, batch_build = _retained(as_batch)
+        started = time.perf_counter()
+        batch_text = client.format_replies(batch, None)
+        batch_format = time.perf_counter() - started
+    finally:
+        client.close()
+    assert list_text == batch_text
+    print(f"replies={len(batch)} members={len(batch.usernames)}")
+    print(f"{'layout':>12} {'retained_MiB':>13} {'build_s':>8} {'format_s':>9}")
+    print(f"{'list[Reply]':>12} {list_bytes / 2**20:>13.2f} {list_build:>8.3f} {list_format:>9.3f}")
+    print(f"{'ReplyBatch':>12} {batch_bytes / 2**20:>13.2f} {batch_build:>8.3f} {batch_format:>9.3f}")
+
+
+def bench_intern(args: argparse.Namespace) -> None:
+    bodies = [replies_page_body(PER_PAGE, start) for start in range(0, args.replies, PER_PAGE)]
+
+    def decode_all(interner: Optional[InternPool]) -> list[Any]:
+        replies: list[Any] = []
+        for body in bodies:
+            replies.extend(_decode(RepliesResponse, body, interner).result)
+        return replies
+
+    plain, plain_bytes, plain_s = _retained(lambda: decode_all(None))
+    del plain
+    pool = InternPool()
+    interned, interned_bytes, interned_s = _retained(lambda: decode_all(pool))
+    print(f"replies={len(interned)} {pool.summary()}")
+    print(f"{'members':>9} {'retained_MiB':>13} {'decode_s':>9}")
+    print(f"{'per-reply':>9} {plain_bytes / 2**20:>13.2f} {plain_s:>9.3f}")
+    print(f"{'interned':>9} {interned_bytes / 2**20:>13.2f} {interned_s:>9.3f}")
+
+
+def bench_projection(args: argparse.Namespace) -> None:
+    request = httpx.Request("GET", "http://stand-in/api/v2/topics/1/replies")
+    responses = [
+        httpx.Response(200, content=replies_page_body(PER_PAGE, start), request=request)
+        for start in range(0, args.replies, PER_PAGE)
+    ]
+
+    def decode_all(projection: bool) -> list[Any]:
+        replies: list[Any] = []
+        for page, response in enumerate(responses, start=1):
+            replies.extend(_parse_replies_response(response, page, projection=projection).result)
+        return replies
+
+    full, full_bytes, full_s = _retained(lambda: decode_all(False))
+    del full
+    lean, lean_bytes, lean_s = _retained(lambda: decode_all(True))
+    print(f"replies={len(lean)} pages={len(responses)}")
+    print(f"{'models':>10} {'retained_MiB':>13} {'decode_s':>9}")
+    print(f"{'full':>10} {full_bytes / 2**20:>13.2f} {full_s:>9.3f}")
+    print(f"{'projected':>10} {lean_bytes / 2**20:>13.2f} {lean_s:>9.3f}")
+
+
+def _peak(run: Any) -> int:
+    tracemalloc.start()
+    run()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak
+
+
+def _serve(replies: int, per_page: int, conn: Any) -> None:
+    with stand_in_api(0.0, replies) as server:
+        server.per_page = per_page
+        conn.send(server.api_base)
+        conn.recv()
+
+
+@contextmanager
+def stand_in_process(replies: int, per_page: int = PER_PAGE) -> Iterator[str]:
+    """Run the stand-in in a child process so its allocations stay out of tracemalloc."""
+    parent, child = multiprocessing.Pipe()
+    process = multiprocessing.Process(target=_serve, args=(replies, per_page, child), daemon=True)
+    process.start()
+    try:
+        yield parent.recv()
+    finally:
+        parent.send(None)
+        process.join()
+
+
+def bench_stream(args: argparse.Namespace) -> None:
+    with stand_in_process(args.per_page, args.per_page) as api_base:
+        with V2EXClient("bench", api_base=api_base) as client:
+            client.preconnect()
+
+            def consume() -> None:
+                # Per-reply work stands in for formatting or spooling; nothing is kept.
+                for _ in client.stream_replies_page(1, 1):
+                    pass
+
+            buffered_s = _timeit(lambda: client.fetch_replies_page(1, 1, revalidate=True), args.rounds)
+            streamed_s = _timeit(consume, args.rounds)
+            buffered_peak = _peak(lambda: client.fetch_replies_page(1, 1, revalidate=True))
+            streamed_peak = _peak(consume)
+    print(f"page={args.per_page} replies")
+    print(f"{'mode':>9} {'peak_MiB':>9} {'time_s':>7}")
+    print(f"{'buffered':>9} {buffered_peak / 2**20:>9.2f} {buffered_s:>7.3f}")
+    print(f"{'streamed':>9} {streamed_peak / 2**20:>9.2f} {streamed_s:>7.3f}")
+
+
+def bench_spool(args: argparse.Namespace) -> None:
+    pages = -(-args.replies // PER_PAGE)
+    print(f"replies={args.replies} pages={pages}")
+    print(f"{'mode':>9} {'peak_MiB':>9} {'time_s':>7}")
+    with stand_in_process(args.replies) as api_base:
+        # Several full passes exceed the default hourly quota; the stand-in does not enforce one.
+        limiter = RateLimiter(limit=1_000_000)
+        with V2EXClient("bench", api_base=api_base, max_concurrency=args.concurrency, rate_limiter=limiter) as client:
+            client.preconnect()
+
+            def in_memory() -> None:
+                client.build_bundle(1, pages)
+
+            def spooled() -> None:
+                with client.spool_bundle(1, pages) as spool:
+                    for _ in spool.iter_chunks():
+                        pass
+
+            for label, run in (("memory", in_memory), ("spool", spooled)):
+                started = time.perf_counter()
+                run()
+                elapsed = time.perf_counter() - started
+                print(f"{label:>9} {_peak(run) / 2**20:>9.2f} {elapsed:>7.3f}")
+
+
+def _legacy_format_bundle(client: V2EXClient, topic: Topic, replies: list[Any]) -> str:
+    # The list-and-join formatter format_bundle replaced, kept as the baseline.
+    lines: list[str] = []
+    for idx, reply in enumerate(replies, start=1):
+        author = _pick_first(
+            reply.member.username if reply.member else None,
+            reply.member.name if reply.member else None,
+            reply.member.id if reply.member else None,
+        )
+        created = _pick_first(reply.created, reply.created_at)
+        content = _pick_first(reply.content, reply.content_rendered)
+        block = "\n".join(
+            [
+                f"[{idx}] Author: {author}",
+                f"Created: {created}",
+                f"Content:\n{_truncate(content, None)}",
+            ]
+        )
+        lines.append(block)
+    replies_text = "\n\n".join(lines).strip()
+    topic_text = client.format_topic(topic, None)
+    return "\n\n".join(
+        ["文章内容（主题）:", topic_text or "N/A", "", "评论:", replies_text or "No replies."]
+    ).strip()
+
+
+def bench_format(args: argparse.Namespace) -> None:
+    topic = Topic.model_validate(make_topic(1, max(args.replies)))
+    bodies = [replies_page_body(PER_PAGE, start) for start in range(0, max(args.replies), PER_PAGE)]
+    replies = [reply for body in bodies for reply in _decode(RepliesResponse, body).result]
+    client = V2EXClient("bench")
+    try:
+        print(f"{'replies':>8} {'join_ms':>8} {'writer_ms':>10} {'speedup':>8}")
+        for count in args.replies:
+            subset = replies[:count]
+            assert client.format_bundle(topic, subset) == _legacy_format_bundle(client, topic, subset)
+            legacy = _timeit(lambda: _legacy_format_bundle(client, topic, subset), args.rounds)
+            writer = _timeit(lambda: client.format_bundle(topic, subset), args.rounds)
+            print(f"{count:>8} {legacy * 1e3:>8.2f} {writer * 1e3:>10.2f} {legacy / writer:>7.2f}x")
+    finally:
+        client.close()
+
+
+class StandInLLMHandler(BaseHTTPRequestHandler):
+    """OpenAI-compatible chat completions with a scripted analyst.
+
+    The first turn of a tool-enabled run without an inlined bundle asks for
+    get_topic_bundle, like the real model does; every other turn answers in
+    ``answer_chunks`` pieces per framework section it is asked about, one
+    every ``chunk_delay``. Each turn waits ``ttft`` before its first chunk.
+    """
+
+    server: "StandInLLM"
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+    def do_POST(self) -> None:
+        request = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        messages = request["messages"]
+        self.server.calls += 1
+        time.sleep(self.server.ttft)
+        prompt = next(m["content"] for m in messages if m["role"] == "user")
+        wants_tool = (
+            request.get("tools")
+            and not any(m["role"] == "tool" for m in messages)
+            and "get_topic_bundle(" not in prompt
+        )
+        call: Optional[dict[str, Any]] = None
+        if wants_tool:
+            match = re.search(r"topic_id=(\d+), max_pages=(\d+)", prompt)
+            arguments = json.dumps({"topic_id": int(match[1]), "max_pages": int(match[2])}) if match else "{}"
+            call = {"index": 0, "id": "call_1", "type": "function"}
+            call["function"] = {"name": "get_topic_bundle", "arguments": arguments}
+        # Answers grow with the number of framework sections the instructions ask for.
+        system = next((m["content"] for m in messages if m["role"] == "system"), "")
+        pieces = [f"分析 {idx} " for idx in range(self.server.answer_chunks * max(1, system.count("### ")))]
+        if not request.get("stream"):
+            time.sleep(self.server.chunk_delay * len(pieces))
+            message: dict[str, Any] = {"role": "assistant", "content": None if call else "".join(pieces)}
+            if call:
+                message["tool_calls"] = [call]
+            body = {
+                "id": "chatcmpl-bench",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": request["model"],
+                "choices": [{"index": 0, "message": message, "finish_reason": "tool_calls" if call else "stop"}],
+                "usage": {"prompt_tokens": len(json.dumps(messages)) // 4, "completion_tokens": 40, "total_tokens": 0},
+            }
+            data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+        if call:
+            self.send_chunk(request, {"role": "assistant", "tool_calls": [call]})
+            self.send_chunk(request, {}, "tool_calls")
+        else:
+            for piece in pieces:
+                self.send_chunk(request, {"role": "assistant", "content": piece})
+                time.sleep(self.server.chunk_delay)
+            self.send_chunk(request, {}, "stop")
+        self.wfile.write(b"data: [DONE]\n\n")
+
+    def send_chunk(self, request: dict[str, Any], delta: dict[str, Any], finish: Optional[str] = None) -> None:
+        chunk = {
+            "id": "chatcmpl-bench",
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": request["model"],
+            "choices": [{"index": 0, "delta": delta, "finish_reason": finish}],
+        }
+        self.wfile.write(b"data: " + json.dumps(chunk, ensure_ascii=False).encode("utf-8") + b"\n\n")
+        self.wfile.flush()
+
+
+class StandInLLM(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, ttft: float, answer_chunks: int = 20, chunk_delay: float = 0.005) -> None:
+        super().__init__(("127.0.0.1", 0), StandInLLMHandler)
+        self.ttft = ttft
+        self.answer_chunks = answer_chunks
+        self.chunk_delay = chunk_delay
+        self.calls = 0
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host!s}:{port}/v1"
+
+
+@contextmanager
+def stand_in_llm(ttft: float) -> Iterator[StandInLLM]:
+    server = StandInLLM(ttft)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    previous = {name: os.environ.get(name) for name in ("OPENAI_BASE_URL", "OPENAI_API_KEY")}
+    os.environ["OPENAI_BASE_URL"] = server.base_url
+    os.environ["OPENAI_API_KEY"] = "bench"
+    try:
+        yield server
+    finally:
+        for name, value in previous.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+        server.shutdown()
+        server.server_close()
+
+
+def bench_inline(args: argparse.Namespace) -> None:
+    from agents import set_tracing_disabled
+
+    import main as agent_main
+
+    set_tracing_disabled(True)
+
+    async def analyze(api_base: str, pages: int, mode: str) -> None:
+        async with AsyncV2EXClient("bench", api_base=api_base) as client:
+            prefetched: dict[tuple[int, int], asyncio.Future[str]] = {}
+            agent = agent_main.build_agent("bench-model", client, inline=mode == "inline", prefetched=prefetched)
+            bundle = None
+            if mode == "inline":
+                bundle = await agent_main._load_bundle(client, 1, pages)
+            elif mode == "prefetch":
+                prefetched[(1, pages)] = asyncio.create_task(agent_main._load_bundle(client, 1, pages))
+            await agent_main._analyze_topic(agent, 1, pages, bundle=bundle)
+
+    print(f"{'pages':>5} {'mode':>8} {'llm_calls':>9} {'mean_s':>7}")
+    with stand_in_api(args.latency, 20 * max(args.pages)) as api, stand_in_llm(args.ttft) as llm:
+        for pages in args.pages:
+            for mode in ("tool", "prefetch", "inline"):
+                llm.calls = 0
+                started = time.perf_counter()
+                for _ in range(args.runs):
+                    asyncio.run(analyze(api.api_base, pages, mode))
+                elapsed = (time.perf_counter() - started) / args.runs
+                print(f"{pages:>5} {mode:>8} {llm.calls / args.runs:>9.1f} {elapsed:>7.3f}")
+
+
+def bench_sections(args: argparse.Namespace) -> None:
+    from agents import set_tracing_disabled
+
+    import main as agent_main
+
+    set_tracing_disabled(True)
+
+    async def analyze(api_base: str, sections: bool) -> None:
+        async with AsyncV2EXClient("bench", api_base=api_base) as client:
+            bundle = await agent_main._load_bundle(client, 1, args.pages)
+            if sections:
+                await agent_main._collect(agent_main._section_deltas("bench-model", 1, bundle))
+                return
+            agent = agent_main.build_agent("bench-model", client, inline=True)
+            await agent_main._analyze_topic(agent, 1, args.pages, bundle=bundle)
+
+    print(f"{'mode':>8} {'llm_calls':>9} {'mean_s':>7}")
+    with stand_in_api(args.latency, 20 * args.pages) as api, stand_in_llm(args.ttft) as llm:
+        llm.chunk_delay = args.chunk_delay
+        for label, sections in (("single", False), ("sections", True)):
+            llm.calls = 0
+            started = time.perf_counter()
+            for _ in range(args.runs):
+                asyncio.run(analyze(api.api_base, sections))
+            elapsed = (time.perf_counter() - started) / args.runs
+            print(f"{label:>8} {llm.calls / args.runs:>9.1f} {elapsed:>7.3f}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="V2EX client benchmarks.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    fanout = sub.add_parser("fanout", help="Serial vs concurrent reply-page fetching.")
+    fanout.add_argument("--latency", type=float, default=0.05, help="Injected per-request latency (s).")
+    fanout.add_argument("--pages", type=int, nargs="+", default=[1, 5, 10, 20])
+    fanout.add_argument("--concurrency", type=int, default=8)
+    fanout.set_defaults(func=bench_fanout)
+
+    pool = sub.add_parser("pool", help="Connection reuse across a batch of topics.")
+    pool.add_argument("--latency", type=float, default=0.01)
+    pool.add_argument("--topics", type=int, default=10)
+    pool.add_argument("--pages", type=int, default=3)
+    pool.set_defaults(func=bench_pool)
+
+    cache = sub.add_parser("cache", help="Response cache hits and conditional revalidation.")
+    cache.add_argument("--latency", type=float, default=0.05)
+    cache.add_argument("--pages", type=int, default=5)
+    cache.add_argument("--runs", type=int, default=3)
+    cache.set_defaults(func=bench_cache)
+
+    ratelimit = sub.add_parser("ratelimit", help="Concurrent topics paced under a small server quota.")
+    ratelimit.add_argument("--latency", type=float, default=0.01)
+    ratelimit.add_argument("--limit", type=int, default=40, help="Requests allowed per window.")
+    ratelimit.add_argument("--window", type=int, default=3, help="Quota window in seconds.")
+    ratelimit.add_argument("--topics", type=int, default=8)
+    ratelimit.add_argument("--pages", type=int, default=5)
+    ratelimit.set_defaults(func=bench_ratelimit)
+
+    tail = sub.add_parser("tail", help="Tail latency with retries and hedged requests.")
+    tail.add_argument("--latency", type=float, default=0.01)
+    tail.add_argument("--slow-rate", type=float, default=0.03, help="Share of requests hitting the slow path.")
+    tail.add_argument("--slow-latency", type=float, default=0.3)
+    tail.add_argument("--error-rate", type=float, default=0.02, help="Share of requests answered with 503.")
+    tail.add_argument("--requests", type=int, default=300)
+    tail.add_argument("--pages", type=int, default=5)
+    tail.add_argument("--seed", type=int, default=7)
+    tail.set_defaults(func=bench_tail)
+
+    bundle = sub.add_parser("bundle", help="Serial topic-then-replies vs parallel topic and first page.")
+    bundle.add_argument("--latency", type=float, default=0.05)
+    bundle.add_argument("--pages", type=int, nargs="+", default=[1, 2, 5])
+    bundle.set_defaults(func=bench_bundle)
+
+    parse = sub.add_parser("parse", help="Per-page decode cost of a synthetic reply page.")
+    parse.add_argument("--replies", type=int, default=100)
+    parse.add_argument("--rounds", type=int, default=500)
+    parse.set_defaults(func=bench_parse)
+
+    memory = sub.add_parser("memory", help="Retained memory of list[Reply] vs a columnar ReplyBatch.")
+    memory.add_argument("--replies", type=int, default=10000)
+    memory.set_defaults(func=bench_memory)
+
+    intern = sub.add_parser("intern", help="Decoding with and without shared Member/Node instances.")
+    intern.add_argument("--replies", type=int, default=10000)
+    intern.set_defaults(func=bench_intern)
+
+    projection = sub.add_parser("projection", help="Full models vs projected views that skip rendered HTML.")
+    projection.add_argument("--replies", type=int, default=10000)
+    projection.set_defaults(func=bench_projection)
+
+    stream = sub.add_parser("stream", help="Peak memory of a buffered vs streamed reply page.")
+    stream.add_argument("--per-page", type=int, default=2000)
+    stream.add_argument("--rounds", type=int, default=5)
+    stream.set_defaults(func=bench_stream)
+
+    spool = sub.add_parser("spool", help="Peak memory of an in-memory vs spooled bundle.")
+    spool.add_argument("--replies", type=int, default=5000)
+    spool.add_argument("--concurrency", type=int, default=4)
+    spool.set_defaults(func=bench_spool)
+
+    fmt = sub.add_parser("format", help="List-and-join vs single-pass bundle formatting.")
+    fmt.add_argument("--replies", type=int, nargs="+", default=[1000, 10000])
+    fmt.add_argument("--rounds", type=int, default=20)
+    fmt.set_defaults(func=bench_format)
+
+    inline = sub.add_parser("inline", help="Tool-call flow, with a speculative prefetch, and inline bundle.")
+    inline.add_argument("--ttft", type=float, default=0.8, help="Stand-in LLM time to first chunk per turn (s).")
+    inline.add_argument("--latency", type=float, default=0.05, help="Injected V2EX per-request latency (s).")
+    inline.add_argument("--pages", type=int, nargs="+", default=[1, 5])
+    inline.add_argument("--runs", type=int, default=3)
+    inline.set_defaults(func=bench_inline)
+
+    sections = sub.add_parser("sections", help="One framework generation vs one concurrent call per section.")
+    sections.add_argument("--ttft", type=float, default=0.8, help="Stand-in LLM time to first chunk per call (s).")
+    sections.add_argument("--chunk-delay", type=float, default=0.02, help="Stand-in LLM delay per answer chunk (s).")
+    sections.add_argument("--latency", type=float, default=0.05, help="Injected V2EX per-request latency (s).")
+    sections.add_argument("--pages", type=int, default=2)
+    sections.add_argument("--runs", type=int, default=3)
+    sections.set_defaults(func=bench_sections)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -6,14 +6,34 @@ import nest_asyncio
 nest_asyncio.apply()
 import argparse
 import asyncio
+import hashlib
 import logging
 import os
+import re
+import sys
+import tempfile
+import time
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Optional
 
 from agents import Agent, OpenAIProvider, RunConfig, Runner, function_tool
+from agents.result import RunResultStreaming
 from agents.stream_events import RawResponsesStreamEvent
+from agents.usage import Usage
 from openai.types.responses.response_text_delta_event import ResponseTextDeltaEvent
 
-from v2ex import V2EXClient
+from v2ex import AsyncV2EXClient, format_bundle_text
+from v2ex_cache import (
+    DEFAULT_CACHE_DIR,
+    DEFAULT_TTL,
+    AnalysisCache,
+    ResponseCache,
+    StoredAnalysis,
+    analysis_key,
+)
+from v2ex_retry import RetryPolicy
+from v2ex_spool import TrailingTrim
+from v2ex_tokens import TokenCounter
 
 from openinference.instrumentation.openai_agents import OpenAIAgentsInstrumentor
 
@@ -73,50 +93,621 @@ ANALYST_INSTRUCTIONS = (
     f"{ANALYSIS_FRAMEWORK}"
 )
 
+INLINE_ANALYST_INSTRUCTIONS = (
+    "你是一位专业的内容分析师。"
+    "消息里已附上 get_topic_bundle 返回的文章内容（主题）与评论，请直接基于它分析；"
+    "只有需要更多页评论时才调用工具 get_topic_bundle。然后严格按以下框架逐一回答问题。"
+    "回答要具体、有洞察，避免泛泛而谈。如果某个问题信息不足无法回答，请说明原因。\n\n"
+    f"{ANALYSIS_FRAMEWORK}"
+)
+
+MAP_INSTRUCTIONS = (
+    "你是一位专业的内容分析师。下面是一篇 V2EX 主题下按顺序编号的一部分评论。"
+    "请提炼这些评论中的主要观点、论据、分歧、有代表性的具体案例和关于作者背景的线索，"
+    "引用时保留评论编号（如 [12]）。只依据给出的评论，不要编造，也不要给出整体结论。"
+)
+
+REDUCE_INSTRUCTIONS = (
+    "你是一位专业的内容分析师。"
+    "下面给出文章内容（主题），以及按评论顺序分批整理的评论摘要，然后严格按以下框架逐一回答问题。"
+    "回答要具体、有洞察，避免泛泛而谈。如果某个问题信息不足无法回答，请说明原因。\n\n"
+    f"{ANALYSIS_FRAMEWORK}"
+)
+
+UPDATE_INSTRUCTIONS = (
+    "你是一位专业的内容分析师。"
+    "下面给出你之前对一篇 V2EX 主题的分析，以及此后新增的评论（保留原评论编号）。"
+    "请结合新增评论更新原分析：保留仍然成立的内容，修正或补充新评论带来的变化，"
+    "然后输出完整的、更新后的分析，仍严格按以下框架逐一回答问题。"
+    "回答要具体、有洞察，避免泛泛而谈。如果某个问题信息不足无法回答，请说明原因。\n\n"
+    f"{ANALYSIS_FRAMEWORK}"
+)
 
-def build_agent(openai_model: str, v2ex_token: str) -> Agent:
-    v2ex_client = V2EXClient(v2ex_token)
+# The framework's "### " sections, as (heading, section text) in framework order.
+FRAMEWORK_SECTIONS = [
+    (part.splitlines()[0], part.strip())
+    for part in re.split(r"(?m)^(?=### )", ANALYSIS_FRAMEWORK)
+    if part.startswith("### ")
+]
+
+SECTION_INSTRUCTIONS = (
+    "你是一位专业的内容分析师。"
+    "下面给出文章内容（主题）与评论，请只回答分析框架中的以下这一部分，逐一回答其中的问题，"
+    "不要重复小节标题，也不要回答其他部分。"
+    "回答要具体、有洞察，避免泛泛而谈。如果某个问题信息不足无法回答，请说明原因。\n\n"
+)
+
+DEFAULT_OUTPUT_DIR = "analysis_outputs"
+DEFAULT_CHUNK_TOKENS = 12000
+DEFAULT_MAP_CONCURRENCY = 4
+
+
+@dataclass
+class MapReduceConfig:
+    """Settings for analyzing a thread as concurrent chunk summaries plus one framework pass."""
+
+    chunk_tokens: int = DEFAULT_CHUNK_TOKENS
+    concurrency: int = DEFAULT_MAP_CONCURRENCY
+
+
+@dataclass
+class StageStats:
+    name: str
+    elapsed: float = 0.0
+    usage: Usage = field(default_factory=Usage)
+
+    def summary(self) -> str:
+        if not self.usage.requests:
+            return f"{self.name}: {self.elapsed:.2f}s"
+        return (
+            f"{self.name}: {self.elapsed:.2f}s requests={self.usage.requests} "
+            f"input_tokens={self.usage.input_tokens} output_tokens={self.usage.output_tokens}"
+        )
+
+
+async def _load_bundle(
+    v2ex_client: AsyncV2EXClient,
+    topic_id: int,
+    max_pages: int,
+    incremental: bool = False,
+    token_budget: Optional[int] = None,
+    counter: Optional[TokenCounter] = None,
+) -> str:
+    if token_budget is None:
+        return await v2ex_client.build_bundle(topic_id, max_pages, incremental=incremental)
+    bundle, report = await v2ex_client.build_budgeted_bundle(
+        topic_id, max_pages, token_budget, counter=counter, incremental=incremental
+    )
+    logger.info("Bundle budget for topic %s: %s", topic_id, report.summary())
+    return bundle
+
+
+def build_agent(
+    openai_model: str,
+    v2ex_client: AsyncV2EXClient,
+    incremental: bool = False,
+    token_budget: Optional[int] = None,
+    inline: bool = False,
+    prefetched: Optional[dict[tuple[int, int], "asyncio.Future[str]"]] = None,
+) -> Agent:
+    """Build the analyst agent.
+
+    ``prefetched`` maps (topic_id, max_pages) to bundles already being
+    fetched; a tool call with matching arguments awaits that task instead of
+    starting its own fetch.
+    """
+    counter = TokenCounter(openai_model) if token_budget is not None else None
 
     @function_tool(strict_mode=False)
-    def get_topic_bundle(topic_id: int, max_pages: int = 1) -> str:
+    async def get_topic_bundle(topic_id: int, max_pages: int = 1) -> str:
         """Fetch V2EX topic and replies, formatted for analysis."""
-        return v2ex_client.build_bundle(topic_id, max_pages)
+        task = prefetched.pop((topic_id, max_pages), None) if prefetched is not None else None
+        if task is not None:
+            started = time.perf_counter()
+            try:
+                bundle = await task
+            except Exception as exc:
+                logger.warning("Prefetched bundle for topic %s failed (%s); fetching again", topic_id, exc)
+            else:
+                logger.info("Prefetched bundle for topic %s, waited %.3fs", topic_id, time.perf_counter() - started)
+                return bundle
+        return await _load_bundle(v2ex_client, topic_id, max_pages, incremental, token_budget, counter)
 
     return Agent(
         name="V2EX Analyst",
-        instructions=ANALYST_INSTRUCTIONS,
+        instructions=INLINE_ANALYST_INSTRUCTIONS if inline else ANALYST_INSTRUCTIONS,
         model=openai_model,
         tools=[get_topic_bundle],
     )
 
 
-def analyze_with_agents(topic_id: int, max_pages: int, openai_model: str, v2ex_token: str) -> str:
-    async def _run() -> str:
-        agent = build_agent(openai_model, v2ex_token)
-        run_config = RunConfig(model_provider=OpenAIProvider(use_responses=False))
-        prompt = f"topic_id={topic_id}, max_pages={max_pages}"
-        result = Runner.run_streamed(agent, prompt, run_config=run_config)
-        chunks: list[str] = []
-        async for event in result.stream_events():
-            if isinstance(event, RawResponsesStreamEvent) and isinstance(event.data, ResponseTextDeltaEvent):
-                logger.debug(event.data.delta)
-                chunks.append(event.data.delta)
-        logger.info("Streaming complete")
-        output = "".join(chunks).strip()
-        if not output and result.final_output is not None:
-            output = str(result.final_output).strip()
-        return output
+def _discard(task: "asyncio.Future[str]") -> None:
+    task.cancel()
+    if task.done() and not task.cancelled():
+        # Retrieve the result or error so an unused failed prefetch is not reported as unhandled.
+        task.exception()
+
+
+def _run_config() -> RunConfig:
+    return RunConfig(model_provider=OpenAIProvider(use_responses=False))
+
+
+async def _iter_deltas(result: RunResultStreaming, started: float) -> AsyncIterator[str]:
+    """Yield text deltas as the model streams them, falling back to the final output if none carried text."""
+    seen_text = False
+    async for event in result.stream_events():
+        if isinstance(event, RawResponsesStreamEvent) and isinstance(event.data, ResponseTextDeltaEvent):
+            delta = event.data.delta
+            logger.debug(delta)
+            if not seen_text and delta.strip():
+                seen_text = True
+                logger.info("Time to first byte: %.3fs", time.perf_counter() - started)
+            yield delta
+    logger.info("Streaming complete")
+    if not seen_text and result.final_output is not None:
+        yield str(result.final_output)
+
+
+def _analyst_deltas(agent: Agent, topic_id: int, max_pages: int, bundle: Optional[str] = None) -> AsyncIterator[str]:
+    """Run the analyst; a prefetched ``bundle`` goes straight into the prompt, saving the tool-call turn."""
+    started = time.perf_counter()
+    prompt = f"topic_id={topic_id}, max_pages={max_pages}"
+    if bundle is not None:
+        prompt += f"\n\nget_topic_bundle(topic_id={topic_id}, max_pages={max_pages}) 的结果:\n\n{bundle}"
+    return _iter_deltas(Runner.run_streamed(agent, prompt, run_config=_run_config()), started)
+
+
+async def _collect(deltas: AsyncIterator[str], writer: Optional["AnalysisWriter"] = None) -> str:
+    chunks: list[str] = []
+    async for delta in deltas:
+        chunks.append(delta)
+        if writer is not None:
+            writer.write(delta)
+    return "".join(chunks).strip()
+
+
+async def _analyze_topic(agent: Agent, topic_id: int, max_pages: int, bundle: Optional[str] = None) -> str:
+    return await _collect(_analyst_deltas(agent, topic_id, max_pages, bundle))
+
+
+async def _map_reduce_deltas(
+    openai_model: str,
+    topic_id: int,
+    topic_text: str,
+    chunks: list[str],
+    config: MapReduceConfig,
+) -> AsyncIterator[str]:
+    """Summarize token-bounded reply chunks concurrently, then answer the framework over the summaries.
+
+    A thread whose replies fit in one chunk skips the map stage and is
+    analyzed from the replies themselves. Only the final pass is streamed.
+    """
+    summarizer = Agent(name="V2EX Reply Summarizer", instructions=MAP_INSTRUCTIONS, model=openai_model)
+    map_stage = StageStats("map")
+    semaphore = asyncio.Semaphore(max(1, config.concurrency))
+
+    async def summarize(chunk: str) -> str:
+        async with semaphore:
+            result = await Runner.run(summarizer, chunk, run_config=_run_config())
+        map_stage.usage.add(result.context_wrapper.usage)
+        return str(result.final_output).strip()
+
+    started = time.perf_counter()
+    if len(chunks) > 1:
+        summaries = await asyncio.gather(*(summarize(chunk) for chunk in chunks))
+        comments = "\n\n".join(
+            f"第 {index} 批评论摘要:\n{summary}" for index, summary in enumerate(summaries, start=1)
+        )
+    else:
+        comments = chunks[0] if chunks else "No replies."
+    map_stage.elapsed = time.perf_counter() - started
+
+    analyst = Agent(name="V2EX Analyst", instructions=REDUCE_INSTRUCTIONS, model=openai_model)
+    reduce_stage = StageStats("reduce")
+    started = time.perf_counter()
+    result = Runner.run_streamed(analyst, format_bundle_text(topic_text, comments), run_config=_run_config())
+    async for delta in _iter_deltas(result, started):
+        yield delta
+    reduce_stage.usage.add(result.context_wrapper.usage)
+    reduce_stage.elapsed = time.perf_counter() - started
+
+    logger.info("Map-reduce for topic %s: %s chunks", topic_id, len(chunks))
+    for stage in (map_stage, reduce_stage):
+        logger.info("  %s", stage.summary())
+
+
+async def _section_deltas(openai_model: str, topic_id: int, bundle: str) -> AsyncIterator[str]:
+    """Answer each framework section in its own concurrent model call over one shared bundle.
+
+    Sections are emitted in framework order under their headings, each as
+    soon as it and every section before it are done.
+    """
+
+    async def answer(heading: str, section: str) -> tuple[str, StageStats]:
+        stats = StageStats(heading.removeprefix("### "))
+        section_started = time.perf_counter()
+        agent = Agent(name="V2EX Section Analyst", instructions=SECTION_INSTRUCTIONS + section, model=openai_model)
+        result = await Runner.run(agent, bundle, run_config=_run_config())
+        stats.elapsed = time.perf_counter() - section_started
+        stats.usage.add(result.context_wrapper.usage)
+        return str(result.final_output).strip(), stats
+
+    started = time.perf_counter()
+    tasks = [asyncio.create_task(answer(heading, section)) for heading, section in FRAMEWORK_SECTIONS]
+    stages = []
+    try:
+        for index, ((heading, _), task) in enumerate(zip(FRAMEWORK_SECTIONS, tasks)):
+            text, stats = await task
+            if index == 0:
+                logger.info("Time to first byte: %.3fs", time.perf_counter() - started)
+            stages.append(stats)
+            yield f"{heading}\n\n{text}\n\n"
+    finally:
+        for task in tasks:
+            task.cancel()
+    logger.info("Section analysis for topic %s: %.2fs wall", topic_id, time.perf_counter() - started)
+    for stage in stages:
+        logger.info("  %s", stage.summary())
+
+
+async def _update_deltas(
+    agent: Agent,
+    v2ex_client: AsyncV2EXClient,
+    analysis_cache: AnalysisCache,
+    openai_model: str,
+    topic_id: int,
+    max_pages: int,
+    incremental: bool = False,
+) -> AsyncIterator[str]:
+    """Update the stored analysis of ``topic_id`` from the replies posted since it was written.
+
+    Without a stored analysis, or with one written by another model or prompt,
+    the whole thread is analyzed inline. Either way the result and the last
+    reply id it covers are stored for the next update.
+    """
+    latest = await asyncio.to_thread(analysis_cache.load_latest, topic_id)
+    if latest is not None and (latest.model, latest.instructions_version) != (openai_model, UPDATE_VERSION):
+        logger.info("Stored analysis of topic %s is from another model or prompt; analyzing it in full", topic_id)
+        latest = None
+    after_id = latest.last_reply_id if latest is not None else None
+    covered = latest.replies if latest is not None else 0
+    delta = await v2ex_client.build_reply_delta(topic_id, max_pages, after_id, covered, incremental=incremental)
+    started = time.perf_counter()
+    if latest is None:
+        bundle = format_bundle_text(delta.topic_text, delta.replies_text)
+        deltas = _analyst_deltas(agent, topic_id, max_pages, bundle)
+    elif not delta.new_replies:
+        logger.info("No replies to topic %s since reply %s; keeping the stored analysis", topic_id, after_id)
+        yield latest.analysis
+        return
+    else:
+        logger.info(
+            "Updating analysis of topic %s with %s new of %s replies",
+            topic_id,
+            delta.new_replies,
+            delta.total_replies,
+        )
+        updater = Agent(name="V2EX Analysis Updater", instructions=UPDATE_INSTRUCTIONS, model=openai_model)
+        analyzed = delta.total_replies - delta.new_replies
+        previous = f"之前的分析（截至第 {analyzed} 条评论）:\n\n{latest.analysis}\n\n\n\n"
+        prompt = previous + format_bundle_text(delta.topic_text, delta.replies_text, heading="新增评论")
+        deltas = _iter_deltas(Runner.run_streamed(updater, prompt, run_config=_run_config()), started)
+    chunks: list[str] = []
+    async for text in deltas:
+        chunks.append(text)
+        yield text
+    stored = StoredAnalysis(
+        analysis="".join(chunks).strip(),
+        model=openai_model,
+        instructions_version=UPDATE_VERSION,
+        last_reply_id=delta.last_reply_id,
+        replies=delta.total_replies,
+        stored_at=time.time(),
+    )
+    await asyncio.to_thread(analysis_cache.save_latest, topic_id, stored)
+
+
+def _instructions_version(*instructions: str) -> str:
+    return hashlib.sha256("\0".join(instructions).encode("utf-8")).hexdigest()[:16]
+
+
+ANALYST_VERSION = _instructions_version(ANALYST_INSTRUCTIONS)
+INLINE_ANALYST_VERSION = _instructions_version(INLINE_ANALYST_INSTRUCTIONS)
+MAP_REDUCE_VERSION = _instructions_version(MAP_INSTRUCTIONS, REDUCE_INSTRUCTIONS)
+SECTIONS_VERSION = _instructions_version(SECTION_INSTRUCTIONS, *(section for _, section in FRAMEWORK_SECTIONS))
+# Stored analyses used by update mode are written by the inline analyst, then the updater.
+UPDATE_VERSION = _instructions_version(INLINE_ANALYST_INSTRUCTIONS, UPDATE_INSTRUCTIONS)
+
+
+async def _topic_deltas(
+    agent: Agent,
+    v2ex_client: AsyncV2EXClient,
+    prefetched: dict[tuple[int, int], "asyncio.Future[str]"],
+    openai_model: str,
+    topic_id: int,
+    max_pages: int,
+    incremental: bool = False,
+    token_budget: Optional[int] = None,
+    map_reduce: Optional[MapReduceConfig] = None,
+    inline: bool = False,
+    prefetch: bool = True,
+    sections: bool = False,
+    analysis_cache: Optional[AnalysisCache] = None,
+    update: bool = False,
+) -> AsyncIterator[str]:
+    """Stream one topic's analysis in the selected mode.
+
+    Modes that need the thread up front fetch it first; with an
+    ``analysis_cache`` every mode does, so the cache key covers exactly what
+    the model would read and a hit skips the model entirely. ``update`` mode
+    keys off the stored analysis of the topic instead.
+    """
+    if update:
+        if analysis_cache is None:
+            raise ValueError("update mode needs an analysis cache to keep the previous analysis")
+        async for delta in _update_deltas(
+            agent, v2ex_client, analysis_cache, openai_model, topic_id, max_pages, incremental=incremental
+        ):
+            yield delta
+        return
+    counter = TokenCounter(openai_model) if token_budget is not None else None
+    started = time.perf_counter()
+    bundle: Optional[str] = None
+    if map_reduce is not None:
+        topic_text, chunks = await v2ex_client.build_reply_chunks(
+            topic_id, max_pages, map_reduce.chunk_tokens, counter=TokenCounter(openai_model), incremental=incremental
+        )
+        material, version = "\n\n".join([topic_text, *chunks]), MAP_REDUCE_VERSION
+    else:
+        if inline or sections or analysis_cache is not None:
+            bundle = await _load_bundle(v2ex_client, topic_id, max_pages, incremental, token_budget, counter)
+        material = bundle or ""
+        version = SECTIONS_VERSION if sections else INLINE_ANALYST_VERSION if inline else ANALYST_VERSION
+    if map_reduce is not None or bundle is not None:
+        logger.info("Fetched topic %s for analysis in %.2fs", topic_id, time.perf_counter() - started)
+
+    key: Optional[str] = None
+    if analysis_cache is not None:
+        key = analysis_key(material, openai_model, version)
+        cached = await asyncio.to_thread(analysis_cache.get, key)
+        if cached is not None:
+            logger.info("Analysis cache hit for topic %s", topic_id)
+            yield cached
+            return
+
+    if map_reduce is not None:
+        deltas = _map_reduce_deltas(openai_model, topic_id, topic_text, chunks, map_reduce)
+    elif sections:
+        deltas = _section_deltas(openai_model, topic_id, material)
+    elif inline:
+        deltas = _analyst_deltas(agent, topic_id, max_pages, material)
+    else:
+        if bundle is not None:
+            # Already fetched for the cache key; hand it to the tool call.
+            done: asyncio.Future[str] = asyncio.get_running_loop().create_future()
+            done.set_result(bundle)
+            prefetched[(topic_id, max_pages)] = done
+        elif prefetch:
+            # The model asks for exactly this bundle first; fetch it while its first turn runs.
+            prefetched[(topic_id, max_pages)] = asyncio.create_task(
+                _load_bundle(v2ex_client, topic_id, max_pages, incremental, token_budget, counter)
+            )
+        deltas = _analyst_deltas(agent, topic_id, max_pages)
+
+    chunks_out: list[str] = []
+    try:
+        async for delta in deltas:
+            chunks_out.append(delta)
+            yield delta
+    finally:
+        unused = prefetched.pop((topic_id, max_pages), None)
+        if unused is not None:
+            logger.info("Prefetched bundle for topic %s was not used", topic_id)
+            _discard(unused)
+    if analysis_cache is not None and key is not None:
+        await asyncio.to_thread(analysis_cache.put, key, topic_id, openai_model, "".join(chunks_out).strip())
+
+
+def analyze_topics(
+    topic_ids: list[int],
+    max_pages: int,
+    openai_model: str,
+    v2ex_token: str,
+    cache: Optional[ResponseCache] = None,
+    incremental: bool = False,
+    retry_policy: Optional[RetryPolicy] = None,
+    projection: bool = False,
+    token_budget: Optional[int] = None,
+    map_reduce: Optional[MapReduceConfig] = None,
+    inline: bool = False,
+    prefetch: bool = True,
+    output_dir: Optional[str] = None,
+    echo: bool = False,
+    sections: bool = False,
+    analysis_cache: Optional[AnalysisCache] = None,
+    update: bool = False,
+) -> dict[int, str]:
+    """Analyze a batch of topics with one pooled V2EX client.
+
+    With ``output_dir`` set, each analysis is streamed into its file as the
+    model writes it (and to stdout with ``echo``) rather than only returned.
+    """
+
+    async def _run() -> dict[int, str]:
+        # One pooled client for the whole batch so keep-alive connections are
+        # reused across topics and tool calls.
+        async with AsyncV2EXClient(
+            v2ex_token,
+            cache=cache,
+            retry_policy=retry_policy,
+            projection=projection,
+        ) as v2ex_client:
+            await v2ex_client.preconnect()
+            prefetched: dict[tuple[int, int], asyncio.Future[str]] = {}
+            agent = build_agent(
+                openai_model,
+                v2ex_client,
+                incremental=incremental,
+                token_budget=token_budget,
+                inline=inline or update,
+                prefetched=prefetched,
+            )
+            analyses: dict[int, str] = {}
+            for topic_id in topic_ids:
+                deltas = _topic_deltas(
+                    agent,
+                    v2ex_client,
+                    prefetched,
+                    openai_model,
+                    topic_id,
+                    max_pages,
+                    incremental=incremental,
+                    token_budget=token_budget,
+                    map_reduce=map_reduce,
+                    inline=inline,
+                    prefetch=prefetch,
+                    sections=sections,
+                    analysis_cache=analysis_cache,
+                    update=update,
+                )
+                if output_dir is None:
+                    analyses[topic_id] = await _collect(deltas)
+                    continue
+                writer = AnalysisWriter(topic_id, output_dir, echo=echo)
+                try:
+                    analyses[topic_id] = await _collect(deltas, writer)
+                except BaseException:
+                    logger.error("Analysis of topic %s failed; partial output kept at %s", topic_id, writer.abort())
+                    raise
+                logger.info("Saved analysis to %s", writer.commit())
+            logger.info("V2EX connection stats: %s", v2ex_client.connection_stats.summary())
+            logger.info("V2EX quota: %s", v2ex_client.rate_limiter.quota().summary())
+            logger.info("V2EX request latency: %s", v2ex_client.attempt_log.summary())
+            logger.info("V2EX coalesced fetches: %s", v2ex_client.flights.coalesced)
+            logger.info("V2EX interned models: %s", v2ex_client.interner.summary())
+            if cache is not None:
+                logger.info("V2EX cache stats: %s", cache.stats.summary())
+            if analysis_cache is not None:
+                logger.info("Analysis cache stats: %s", analysis_cache.stats.summary())
+        return analyses
 
     return asyncio.run(_run())
 
 
+def analyze_with_agents(
+    topic_id: int,
+    max_pages: int,
+    openai_model: str,
+    v2ex_token: str,
+    inline: bool = False,
+    prefetch: bool = True,
+) -> str:
+    return analyze_topics([topic_id], max_pages, openai_model, v2ex_token, inline=inline, prefetch=prefetch)[topic_id]
+
+
+async def stream_analysis(
+    topic_id: int,
+    max_pages: int,
+    openai_model: str,
+    v2ex_token: str,
+    inline: bool = False,
+    prefetch: bool = True,
+    token_budget: Optional[int] = None,
+    map_reduce: Optional[MapReduceConfig] = None,
+    sections: bool = False,
+    analysis_cache: Optional[AnalysisCache] = None,
+) -> AsyncIterator[str]:
+    """Yield the analysis of one topic as raw text deltas while the model writes it.
+
+    Deltas are not stripped; joining and stripping them gives what
+    analyze_with_agents returns.
+    """
+    async with AsyncV2EXClient(v2ex_token) as v2ex_client:
+        prefetched: dict[tuple[int, int], asyncio.Future[str]] = {}
+        agent = build_agent(
+            openai_model, v2ex_client, token_budget=token_budget, inline=inline, prefetched=prefetched
+        )
+        async for delta in _topic_deltas(
+            agent,
+            v2ex_client,
+            prefetched,
+            openai_model,
+            topic_id,
+            max_pages,
+            token_budget=token_budget,
+            map_reduce=map_reduce,
+            inline=inline,
+            prefetch=prefetch,
+            sections=sections,
+            analysis_cache=analysis_cache,
+        ):
+            yield delta
+
+
+class AnalysisWriter:
+    """Writes analysis_<id>.md incrementally as deltas arrive.
+
+    Text is appended and flushed to a temporary file next to the target and
+    renamed into place by ``commit``, so the target is never half-written;
+    ``abort`` keeps what was written as analysis_<id>.md.partial. Leading and
+    trailing whitespace of the analysis is dropped, so the file body matches
+    the stripped text analyze_topics returns.
+    """
+
+    def __init__(self, topic_id: int, output_dir: str = DEFAULT_OUTPUT_DIR, echo: bool = False) -> None:
+        os.makedirs(output_dir, exist_ok=True)
+        self.path = os.path.join(output_dir, f"analysis_{topic_id}.md")
+        self.echo = echo
+        fd, self._tmp_path = tempfile.mkstemp(prefix=f".analysis_{topic_id}.", suffix=".tmp", dir=output_dir)
+        self._file = os.fdopen(fd, "w", encoding="utf-8")
+        self._file.write(f"# V2EX Analysis {topic_id}\n\n")
+        self._trim = TrailingTrim()
+        self._started = False
+
+    def write(self, delta: str) -> None:
+        if not self._started:
+            delta = delta.lstrip()
+            if not delta:
+                return
+            self._started = True
+        text = self._trim.push(delta)
+        if not text:
+            return
+        self._file.write(text)
+        self._file.flush()
+        if self.echo:
+            sys.stdout.write(text)
+            sys.stdout.flush()
+
+    def commit(self) -> str:
+        self._file.write("\n")
+        self._file.close()
+        os.replace(self._tmp_path, self.path)
+        if self.echo:
+            sys.stdout.write("\n")
+            sys.stdout.flush()
+        return self.path
+
+    def abort(self) -> str:
+        self._file.close()
+        partial = f"{self.path}.partial"
+        os.replace(self._tmp_path, partial)
+        return partial
+
+
 def main() -> None:
     parser = argparse.ArgumentParser(
         prog="v2ex-agent",
         description="Analyze a V2EX topic with OpenAI Agents.",
     )
 
-    parser.add_argument("--topic_id", type=int, required=True, help="V2EX topic id.")
+    parser.add_argument(
+        "--topic_id",
+        type=int,
+        nargs="+",
+        required=True,
+        help="V2EX topic id. Pass several ids to analyze them in one batch.",
+    )
     parser.add_argument(
         "--max-pages",
         type=int,
@@ -124,6 +715,98 @@ def main() -> None:
         help="Max reply pages to fetch.",
     )
 
+    parser.add_argument(
+        "--cache-dir",
+        default=DEFAULT_CACHE_DIR,
+        help="Directory for the on-disk V2EX response cache.",
+    )
+    parser.add_argument(
+        "--cache-ttl",
+        type=float,
+        default=DEFAULT_TTL,
+        help="Seconds a cached V2EX response is served without revalidation.",
+    )
+    parser.add_argument(
+        "--no-http-cache",
+        action="store_true",
+        help="Always fetch from the V2EX API.",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Always run the model, even when an analysis of the same bundle, model and prompt is stored.",
+    )
+    parser.add_argument(
+        "--update",
+        action="store_true",
+        help="Update each topic's stored analysis with only the replies posted since it was written.",
+    )
+    parser.add_argument(
+        "--max-attempts",
+        type=int,
+        default=3,
+        help="Attempts per V2EX request, including the first.",
+    )
+    parser.add_argument(
+        "--hedge-quantile",
+        type=float,
+        default=None,
+        help="Send a duplicate V2EX request once the first exceeds this latency quantile (e.g. 0.95).",
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Reuse stored replies and only fetch pages that can contain new ones.",
+    )
+    parser.add_argument(
+        "--projection",
+        action="store_true",
+        help="Decode only the V2EX fields the bundle uses; skip rendered HTML unless content is empty.",
+    )
+    parser.add_argument(
+        "--token-budget",
+        type=int,
+        default=None,
+        help="Fit the topic bundle into this many tokens, dropping replies that do not fit.",
+    )
+    parser.add_argument(
+        "--inline-bundle",
+        action="store_true",
+        help="Prefetch the bundle into the prompt instead of waiting for the model's first tool call.",
+    )
+    parser.add_argument(
+        "--no-prefetch",
+        action="store_true",
+        help="Fetch the bundle only when the model calls get_topic_bundle, not while its first turn runs.",
+    )
+    parser.add_argument(
+        "--stdout",
+        action="store_true",
+        help="Also print each analysis to stdout as it streams in.",
+    )
+    parser.add_argument(
+        "--sections",
+        action="store_true",
+        help="Answer the five framework sections in concurrent model calls over one shared bundle.",
+    )
+    parser.add_argument(
+        "--map-reduce",
+        action="store_true",
+        help="Summarize replies in token-bounded chunks first, then run the analysis over the summaries.",
+    )
+    parser.add_argument(
+        "--chunk-tokens",
+        type=int,
+        default=DEFAULT_CHUNK_TOKENS,
+        help="Max tokens of replies per map-reduce chunk.",
+    )
+    parser.add_argument(
+        "--map-concurrency",
+        type=int,
+        default=DEFAULT_MAP_CONCURRENCY,
+        help="Chunk summaries run at the same time in map-reduce mode.",
+    )
+
     args = parser.parse_args()
 
     logging.basicConfig(
@@ -135,15 +818,51 @@ def main() -> None:
     if not v2ex_token:
         raise SystemExit("Missing V2EX token. Set V2EX_TOKEN.")
 
-    analysis = analyze_with_agents(args.topic_id, args.max_pages, openai_model, v2ex_token)
-    output_dir = "analysis_outputs"
-    os.makedirs(output_dir, exist_ok=True)
-    output_path = os.path.join(output_dir, f"analysis_{args.topic_id}.md")
-    with open(output_path, "w", encoding="utf-8") as handle:
-        handle.write(f"# V2EX Analysis {args.topic_id}\n\n")
-        handle.write(analysis.strip())
-        handle.write("\n")
-    logging.info("Saved analysis to %s", output_path)
+    topic_ids = list(dict.fromkeys(args.topic_id))
+    cache = None
+    if not args.no_http_cache:
+        cache = ResponseCache(os.path.join(args.cache_dir, "responses.sqlite3"), ttl=args.cache_ttl)
+    analysis_cache = None
+    if not args.no_cache:
+        analysis_cache = AnalysisCache(os.path.join(args.cache_dir, "analyses.sqlite3"))
+    if args.incremental and cache is None:
+        raise SystemExit("--incremental needs the response cache; drop --no-http-cache.")
+    if args.update and analysis_cache is None:
+        raise SystemExit("--update keeps the previous analysis in the analysis cache; drop --no-cache.")
+    if args.update and (args.map_reduce or args.sections or args.token_budget is not None):
+        raise SystemExit("--update cannot be combined with --map-reduce, --sections or --token-budget.")
+    if args.map_reduce and args.sections:
+        raise SystemExit("--map-reduce and --sections are separate modes; pick one.")
+    if args.map_reduce and args.token_budget is not None:
+        raise SystemExit("--map-reduce splits replies by --chunk-tokens; drop --token-budget.")
+    if args.map_concurrency < 1:
+        raise SystemExit("--map-concurrency must be at least 1.")
+    try:
+        analyze_topics(
+            topic_ids,
+            args.max_pages,
+            openai_model,
+            v2ex_token,
+            cache=cache,
+            incremental=args.incremental,
+            retry_policy=RetryPolicy(max_attempts=args.max_attempts, hedge_quantile=args.hedge_quantile),
+            projection=args.projection,
+            token_budget=args.token_budget,
+            map_reduce=MapReduceConfig(args.chunk_tokens, args.map_concurrency) if args.map_reduce else None,
+            inline=args.inline_bundle,
+            prefetch=not args.no_prefetch,
+            output_dir=DEFAULT_OUTPUT_DIR,
+            echo=args.stdout,
+            sections=args.sections,
+            analysis_cache=analysis_cache,
+            update=args.update,
+        )
+    finally:
+        # Flushes access times the response cache buffers for its LRU eviction.
+        if cache is not None:
+            cache.close()
+        if analysis_cache is not None:
+            analysis_cache.close()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,69 @@
+import json
+import random
+import unittest
+from typing import Any
+
+from v2ex_stream import JsonArraySplitter
+
+DOCUMENT: dict[str, Any] = {
+    "success": True,
+    "message": 'says "result": [1, 2] and {braces}',
+    "meta": {"result": [{"id": 0}], "note": "\\"},
+    "result": [
+        {"id": 1, "content": 'a \\"quoted\\" reply with "escapes" \\'},
+        {"id": 2, "content": "brackets ] } [ { inside a string"},
+        {"id": 3, "content": "嵌套", "result": [{"id": 4, "result": []}]},
+        [1, [2, "]"], {}],
+        {"id": 5, "content": ""},
+    ],
+    "pagination": {"page": 1, "pages": 3},
+}
+
+
+def chunked(data: bytes, rng: random.Random) -> list[bytes]:
+    chunks = []
+    pos = 0
+    while pos < len(data):
+        size = rng.randint(1, 16)
+        chunks.append(data[pos : pos + size])
+        pos += size
+    return chunks
+
+
+def split(chunks: list[bytes]) -> tuple[list[Any], Any]:
+    splitter = JsonArraySplitter("result")
+    elements = [json.loads(element) for chunk in chunks for element in splitter.feed(chunk)]
+    return elements, json.loads(splitter.close())
+
+
+class JsonArraySplitterTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.data = json.dumps(DOCUMENT, ensure_ascii=False).encode("utf-8")
+        self.envelope = {**DOCUMENT, "result": []}
+
+    def test_whole_document(self) -> None:
+        elements, envelope = split([self.data])
+        self.assertEqual(elements, DOCUMENT["result"])
+        self.assertEqual(envelope, self.envelope)
+
+    def test_random_chunks(self) -> None:
+        rng = random.Random(0)
+        for _ in range(200):
+            elements, envelope = split(chunked(self.data, rng))
+            self.assertEqual(elements, DOCUMENT["result"])
+            self.assertEqual(envelope, self.envelope)
+
+    def test_single_bytes(self) -> None:
+        elements, envelope = split([self.data[idx : idx + 1] for idx in range(len(self.data))])
+        self.assertEqual(elements, DOCUMENT["result"])
+        self.assertEqual(envelope, self.envelope)
+
+    def test_truncated_stream(self) -> None:
+        splitter = JsonArraySplitter("result")
+        splitter.feed(self.data[: len(self.data) // 2])
+        with self.assertRaises(ValueError):
+            splitter.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
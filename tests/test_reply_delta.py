@@ -0,0 +1,43 @@
+import asyncio
+import unittest
+
+from bench import stand_in_api
+from v2ex import AsyncV2EXClient, ReplyDelta
+
+
+def build_delta(api_base: str, max_pages: int, after_id: int | None, covered: int) -> ReplyDelta:
+    async def run() -> ReplyDelta:
+        async with AsyncV2EXClient("test", api_base=api_base) as client:
+            return await client.build_reply_delta(1, max_pages, after_id, covered)
+
+    return asyncio.run(run())
+
+
+class ReplyDeltaTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.api = self.enterContext(stand_in_api(0.0, 20))
+
+    def test_first_run_covers_the_thread_up_to_max_pages(self) -> None:
+        delta = build_delta(self.api.api_base, 1, None, 0)
+        self.assertEqual((delta.new_replies, delta.total_replies, delta.last_reply_id), (20, 20, 100019))
+
+    def test_new_replies_past_max_pages_are_fetched(self) -> None:
+        self.api.replies = 50
+        delta = build_delta(self.api.api_base, 1, 100019, 20)
+        self.assertEqual((delta.new_replies, delta.total_replies, delta.last_reply_id), (30, 50, 100049))
+        self.assertTrue(delta.replies_text.startswith("[21] Author:"))
+        self.assertIn("[50] Author:", delta.replies_text)
+
+    def test_new_replies_on_a_partial_page(self) -> None:
+        self.api.replies = 45
+        delta = build_delta(self.api.api_base, 1, 100029, 30)
+        self.assertEqual((delta.new_replies, delta.total_replies), (15, 45))
+        self.assertTrue(delta.replies_text.startswith("[31] Author:"))
+
+    def test_no_new_replies(self) -> None:
+        delta = build_delta(self.api.api_base, 1, 100019, 20)
+        self.assertEqual((delta.new_replies, delta.replies_text, delta.last_reply_id), (0, "", 100019))
+
+
+if __name__ == "__main__":
+    unittest.main()
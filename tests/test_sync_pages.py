@@ -0,0 +1,55 @@
+import unittest
+from typing import Optional
+
+from v2ex import Reply, ThreadSnapshot, Topic, _sync_pages
+
+PER_PAGE = 20
+
+
+def topic(replies: int, last_touched: int = 1, last_modified: int = 1) -> Topic:
+    return Topic(id=1, replies=replies, last_touched=last_touched, last_modified=last_modified)
+
+
+def snapshot(stored: int, replies: Optional[int] = None, last_touched: int = 1) -> ThreadSnapshot:
+    return ThreadSnapshot(
+        topic=topic(stored if replies is None else replies, last_touched),
+        replies=[Reply(id=idx) for idx in range(stored)],
+        per_page=PER_PAGE,
+    )
+
+
+class SyncPagesTest(unittest.TestCase):
+    def test_without_snapshot_refetches(self) -> None:
+        self.assertIsNone(_sync_pages(topic(10), None, 5))
+
+    def test_unchanged_thread_fetches_nothing(self) -> None:
+        self.assertEqual(_sync_pages(topic(40), snapshot(40), 5), range(0))
+
+    def test_new_replies_start_at_partial_last_page(self) -> None:
+        self.assertEqual(_sync_pages(topic(50, last_touched=2), snapshot(30), 5), range(2, 4))
+
+    def test_new_replies_after_full_last_page(self) -> None:
+        # 40 stored replies fill pages 1-2; page 2 is refetched, page 3 holds the new ones.
+        self.assertEqual(_sync_pages(topic(45, last_touched=2), snapshot(40), 5), range(2, 4))
+
+    def test_empty_snapshot_starts_at_first_page(self) -> None:
+        self.assertEqual(_sync_pages(topic(5, last_touched=2), snapshot(0), 5), range(1, 2))
+
+    def test_deleted_replies_refetch(self) -> None:
+        self.assertIsNone(_sync_pages(topic(39, last_touched=2), snapshot(40), 5))
+
+    def test_delete_plus_add_with_same_count_refetches(self) -> None:
+        self.assertIsNone(_sync_pages(topic(40, last_touched=2), snapshot(40), 5))
+
+    def test_edited_topic_refetches_last_stored_page(self) -> None:
+        self.assertEqual(_sync_pages(topic(40, last_modified=2), snapshot(40), 5), range(2, 3))
+
+    def test_pages_capped_by_max_pages(self) -> None:
+        self.assertEqual(_sync_pages(topic(200, last_touched=2), snapshot(30), 3), range(2, 4))
+
+    def test_snapshot_beyond_max_pages_fetches_nothing(self) -> None:
+        self.assertEqual(_sync_pages(topic(100, last_touched=2), snapshot(60), 2), range(0))
+
+
+if __name__ == "__main__":
+    unittest.main()
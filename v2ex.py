@@ -1,22 +1,113 @@
+import asyncio
+import io
 import logging
-from collections.abc import Iterable
-from typing import Any, Optional
+import math
+import sys
+import threading
+import time
+from abc import ABC, abstractmethod
+from array import array
+from collections import deque
+from collections.abc import AsyncIterator, Awaitable, Callable, Iterable, Iterator, Sequence
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from itertools import islice
+from types import TracebackType
+from typing import Any, Optional, TypeVar, cast
 
 import httpx
-from pydantic import BaseModel, ConfigDict, Field
+from pydantic import BaseModel, ConfigDict, Field, ValidationError, ValidationInfo, model_validator
+
+from v2ex_cache import TOPIC_PAGE, CacheKey, ResponseCache
+from v2ex_ratelimit import RateLimiter
+from v2ex_retry import Attempt, AttemptLog, RetryPolicy
+from v2ex_spool import BundleSpool, TrailingTrim
+from v2ex_stream import JsonArraySplitter
+from v2ex_tokens import BudgetReport, TokenCounter
 
 API_BASE = "https://www.v2ex.com/api/v2"
+DEFAULT_MAX_CONCURRENCY = 4
+DEFAULT_TIMEOUT = 20.0
+DEFAULT_REPLIES_PER_PAGE = 20
+# Tokens kept back for the line that reports omitted replies.
+OMISSION_RESERVE = 16
+DEFAULT_LIMITS = httpx.Limits(max_connections=20, max_keepalive_connections=10, keepalive_expiry=60.0)
 logger = logging.getLogger(__name__)
 
+T = TypeVar("T")
+
 
 class V2exBaseModel(BaseModel):
     model_config = ConfigDict(extra="ignore")
 
 
-class Member(V2exBaseModel):
+@dataclass
+class InternStats:
+    hits: int = 0
+    misses: int = 0
+
+    def summary(self) -> str:
+        total = self.hits + self.misses
+        rate = self.hits / total if total else 0.0
+        return f"shared={self.hits} parsed={self.misses} dedup_rate={rate:.0%}"
+
+
+class InternPool:
+    """Shares one immutable Member/Node instance per id across decoded payloads.
+
+    The first payload seen for an id wins; later payloads with the same id are
+    not validated again and resolve to that instance.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._objects: dict[tuple[type, int], Any] = {}
+        self.stats: dict[str, InternStats] = {}
+
+    def get(self, model: type, key: int) -> Any:
+        with self._lock:
+            found = self._objects.get((model, key))
+            stats = self.stats.setdefault(model.__name__, InternStats())
+            if found is not None:
+                stats.hits += 1
+            else:
+                stats.misses += 1
+            return found
+
+    def add(self, model: type, key: int, value: T) -> T:
+        with self._lock:
+            return self._objects.setdefault((model, key), value)
+
+    def __len__(self) -> int:
+        return len(self._objects)
+
+    def summary(self) -> str:
+        with self._lock:
+            return " ".join(f"{name}({stats.summary()})" for name, stats in sorted(self.stats.items())) or "empty"
+
+
+class InternedModel(V2exBaseModel):
+    model_config = ConfigDict(extra="ignore", frozen=True)
+
+    @model_validator(mode="wrap")
+    @classmethod
+    def _intern(cls, data: Any, handler: Callable[[Any], Any], info: ValidationInfo) -> Any:
+        pool = info.context.get("intern") if isinstance(info.context, dict) else None
+        if pool is None or not isinstance(data, dict) or not isinstance(data.get("id"), int):
+            return handler(data)
+        found = pool.get(cls, data["id"])
+        if found is not None:
+            return found
+        return pool.add(cls, data["id"], handler(data))
+
+
+class MemberView(InternedModel):
     id: int
     username: Optional[str] = None
     name: Optional[str] = None
+
+
+class Member(MemberView):
     bio: Optional[str] = None
     website: Optional[str] = None
     github: Optional[str] = None
@@ -26,11 +117,14 @@ class Member(V2exBaseModel):
     pro: Optional[int] = None
 
 
-class Node(V2exBaseModel):
+class NodeView(InternedModel):
     id: int
-    url: Optional[str] = None
     name: Optional[str] = None
     title: Optional[str] = None
+
+
+class Node(NodeView):
+    url: Optional[str] = None
     header: Optional[str] = None
     footer: Optional[str] = None
     avatar: Optional[str] = None
@@ -39,33 +133,157 @@ class Node(V2exBaseModel):
     last_modified: Optional[int] = None
 
 
-class Topic(V2exBaseModel):
+class TopicView(V2exBaseModel):
+    """The topic fields formatting and incremental sync read."""
+
     id: int
     title: Optional[str] = None
     content: Optional[str] = None
-    content_rendered: Optional[str] = None
-    syntax: Optional[int] = None
-    url: Optional[str] = None
     replies: Optional[int] = None
-    last_reply_by: Optional[str] = None
     created: Optional[int] = None
     created_at: Optional[int] = None
     last_modified: Optional[int] = None
     last_touched: Optional[int] = None
+    member: Optional[MemberView] = None
+    node: Optional[NodeView] = None
+    node_id: Optional[int] = None
+    # Not in the API payload: set after decoding, and only where content is empty.
+    lazy_content_rendered: Optional[str] = None
+
+    @property
+    def rendered(self) -> Optional[str]:
+        """The rendered HTML, where this model holds it."""
+        return self.lazy_content_rendered
+
+
+class Topic(TopicView):
+    content_rendered: Optional[str] = None
+    syntax: Optional[int] = None
+    url: Optional[str] = None
+    last_reply_by: Optional[str] = None
     member: Optional[Member] = None
     node: Optional[Node] = None
-    node_id: Optional[int] = None
     supplements: list[Any] = Field(default_factory=list)
 
+    @property
+    def rendered(self) -> Optional[str]:
+        return self.content_rendered
+
+
+class ReplyView(V2exBaseModel):
+    """The reply fields formatting reads."""
 
-class Reply(V2exBaseModel):
     id: int
     content: Optional[str] = None
-    content_rendered: Optional[str] = None
     created: Optional[int] = None
     created_at: Optional[int] = None
+    member: Optional[MemberView] = None
+    # Not in the API payload: set after decoding, and only where content is empty.
+    lazy_content_rendered: Optional[str] = None
+
+    @property
+    def rendered(self) -> Optional[str]:
+        """The rendered HTML, where this model holds it."""
+        return self.lazy_content_rendered
+
+
+class Reply(ReplyView):
+    content_rendered: Optional[str] = None
     member: Optional[Member] = None
 
+    @property
+    def rendered(self) -> Optional[str]:
+        return self.content_rendered
+
+
+_NO_TIMESTAMP = -(2**63)
+
+
+class ReplyBatch:
+    """Column-oriented replies for very long threads.
+
+    Holds only what the formatter reads: reply ids, resolved created
+    timestamps, an index into a table of interned member labels, and each
+    reply's content as a slice of one shared string buffer.
+    """
+
+    __slots__ = (
+        "ids",
+        "created",
+        "member_index",
+        "member_ids",
+        "usernames",
+        "offsets",
+        "_members",
+        "_buffer",
+        "_pending",
+    )
+
+    def __init__(self) -> None:
+        self.ids = array("q")
+        self.created = array("q")
+        self.member_index = array("l")
+        self.member_ids = array("q")
+        self.usernames: list[str] = []
+        self.offsets = array("q", [0])
+        self._members: dict[int, int] = {}
+        self._buffer = ""
+        self._pending: list[str] = []
+
+    @classmethod
+    def from_replies(cls, replies: Iterable[ReplyView]) -> "ReplyBatch":
+        batch = cls()
+        batch.extend(replies)
+        return batch
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def extend(self, replies: Iterable[ReplyView]) -> None:
+        for reply in replies:
+            self.append(reply)
+
+    def append(self, reply: ReplyView) -> None:
+        self.ids.append(reply.id)
+        created = reply.created if reply.created is not None else reply.created_at
+        self.created.append(_NO_TIMESTAMP if created is None else created)
+        member = reply.member
+        if member is None:
+            self.member_index.append(-1)
+        else:
+            index = self._members.get(member.id)
+            if index is None:
+                index = self._members[member.id] = len(self.member_ids)
+                self.member_ids.append(member.id)
+                self.usernames.append(sys.intern(_pick_first(member.username, member.name, member.id)))
+            self.member_index.append(index)
+        content = _pick_first(reply.content, reply.rendered)
+        self._pending.append(content)
+        self.offsets.append(self.offsets[-1] + len(content))
+
+    @property
+    def buffer(self) -> str:
+        if self._pending:
+            self._buffer += "".join(self._pending)
+            self._pending.clear()
+        return self._buffer
+
+    def content(self, idx: int) -> str:
+        return self.buffer[self.offsets[idx] : self.offsets[idx + 1]]
+
+    def author(self, idx: int) -> str:
+        index = self.member_index[idx]
+        return "" if index < 0 else self.usernames[index]
+
+    def created_at(self, idx: int) -> str:
+        created = self.created[idx]
+        return "" if created == _NO_TIMESTAMP else str(created)
+
+    def rows(self) -> Iterator[tuple[str, str, str]]:
+        """Yield (author, created, content) in thread order."""
+        for idx in range(len(self)):
+            yield self.author(idx), self.created_at(idx), self.content(idx)
+
 
 class Pagination(V2exBaseModel):
     per_page: int
@@ -73,6 +291,17 @@ class Pagination(V2exBaseModel):
     pages: int
 
 
+class ThreadSnapshotView(V2exBaseModel):
+    topic: TopicView
+    replies: Sequence[ReplyView] = Field(default_factory=list)
+    per_page: int
+
+
+class ThreadSnapshot(ThreadSnapshotView):
+    topic: Topic
+    replies: Sequence[Reply] = Field(default_factory=list)
+
+
 class ApiResponse(V2exBaseModel):
     success: bool
     message: Optional[str] = None
@@ -82,17 +311,108 @@ class TopicResponse(ApiResponse):
     result: Topic
 
 
-class RepliesResponse(ApiResponse):
-    result: list[Reply] = Field(default_factory=list)
+class RepliesViewResponse(ApiResponse):
+    result: Sequence[ReplyView] = Field(default_factory=list)
     pagination: Optional[Pagination] = None
 
 
-def _ensure_success(payload: dict[str, Any]) -> None:
-    response = ApiResponse.model_validate(payload)
+class RepliesResponse(RepliesViewResponse):
+    result: Sequence[Reply] = Field(default_factory=list)
+
+
+class TopicViewResponse(ApiResponse):
+    result: TopicView
+
+
+class _Rendered(V2exBaseModel):
+    id: int
+    content_rendered: Optional[str] = None
+
+
+class _RenderedTopic(V2exBaseModel):
+    result: _Rendered
+
+
+class _RenderedReplies(V2exBaseModel):
+    result: list[_Rendered] = Field(default_factory=list)
+
+
+ApiResponseT = TypeVar("ApiResponseT", bound=ApiResponse)
+
+
+def _ensure_success(response: ApiResponse) -> None:
     if not response.success:
         raise RuntimeError(response.message or "V2EX API error")
 
 
+def _decode(model: type[ApiResponseT], body: bytes, interner: Optional[InternPool] = None) -> ApiResponseT:
+    """Parse and validate a response body in one pass straight from bytes."""
+    try:
+        decoded = model.model_validate_json(body, context={"intern": interner} if interner is not None else None)
+    except ValidationError:
+        # Error payloads carry no result; surface their message instead.
+        _ensure_success(ApiResponse.model_validate_json(body))
+        raise
+    _ensure_success(decoded)
+    return decoded
+
+
+def _reply_fields(replies: "Iterable[ReplyView] | ReplyBatch") -> Iterator[tuple[str, str, str]]:
+    """Yield (author, created, content) per reply, resolved as _pick_first would."""
+    if isinstance(replies, ReplyBatch):
+        yield from replies.rows()
+        return
+    # Inlined fast paths for the common case; _pick_first handles the fallbacks.
+    for reply in replies:
+        member = reply.member
+        if member is None:
+            author = ""
+        else:
+            author = member.username or ""
+            if not author.strip():
+                author = _pick_first(member.name, member.id)
+        created: Any = reply.created
+        created = str(created) if created is not None else _pick_first(reply.created_at)
+        content = reply.content or ""
+        if not content.strip():
+            content = _pick_first(reply.rendered)
+        yield author, created, content
+
+
+def _write_bundle_head(write: Callable[[str], Any], topic_text: str, heading: str = "评论") -> None:
+    write(f"文章内容（主题）:\n\n{topic_text or 'N/A'}\n\n\n\n{heading}:\n\n")
+
+
+def format_bundle_text(topic_text: str, comments: str, heading: str = "评论") -> str:
+    """Lay out an already formatted topic and comment section the way format_bundle does."""
+    out = io.StringIO()
+    _write_bundle_head(out.write, topic_text, heading)
+    out.write(comments or "No replies.")
+    return out.getvalue().strip()
+
+
+def _write_replies(
+    write: Callable[[str], Any],
+    replies: "Iterable[ReplyView] | ReplyBatch",
+    max_chars: Optional[int],
+    start: int = 1,
+) -> int:
+    """Write reply blocks separated by blank lines, numbered from ``start``; returns the next number."""
+    separator = "" if start == 1 else "\n\n"
+    idx = start
+    for author, created, content in _reply_fields(replies):
+        if max_chars is not None:
+            content = _truncate(content, max_chars)
+        write(separator + _reply_block(idx, author, created, content))
+        separator = "\n\n"
+        idx += 1
+    return idx
+
+
+def _reply_block(idx: int, author: str, created: str, content: str) -> str:
+    return f"[{idx}] Author: {author}\nCreated: {created}\nContent:\n{content}"
+
+
 def _truncate(text: str, max_chars: Optional[int]) -> str:
     if max_chars is None or len(text) <= max_chars:
         return text
@@ -109,64 +429,376 @@ def _pick_first(*values: Any, default: str = "") -> str:
     return default
 
 
-class V2EXClient:
-    def __init__(self, token: str, api_base: str = API_BASE) -> None:
+def _parse_topic_response(
+    response: httpx.Response,
+    interner: Optional[InternPool] = None,
+    projection: bool = False,
+) -> TopicView:
+    logger.info("V2EX topic response status=%s", response.status_code)
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("V2EX topic response body=%s", response.text)
+    response.raise_for_status()
+    if not projection:
+        return _decode(TopicResponse, response.content, interner).result
+    topic = _decode(TopicViewResponse, response.content, interner).result
+    if _pick_first(topic.content) == "":
+        topic.lazy_content_rendered = _RenderedTopic.model_validate_json(response.content).result.content_rendered
+    return topic
+
+
+def _parse_replies_response(
+    response: httpx.Response,
+    page: int,
+    interner: Optional[InternPool] = None,
+    projection: bool = False,
+) -> RepliesViewResponse:
+    logger.info("V2EX replies response status=%s page=%s", response.status_code, page)
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("V2EX replies response body page=%s body=%s", page, response.text)
+    response.raise_for_status()
+    if not projection:
+        return _decode(RepliesResponse, response.content, interner)
+    decoded = _decode(RepliesViewResponse, response.content, interner)
+    empty = {reply.id: reply for reply in decoded.result if _pick_first(reply.content) == ""}
+    if empty:
+        for item in _RenderedReplies.model_validate_json(response.content).result:
+            if item.id in empty:
+                empty[item.id].lazy_content_rendered = item.content_rendered
+    return decoded
+
+
+class _ReplyStreamDecoder:
+    """Decodes a streamed reply page one reply at a time."""
+
+    def __init__(self, interner: Optional[InternPool], projection: bool, limit: Optional[int] = None) -> None:
+        self._splitter = JsonArraySplitter("result")
+        self._model: type[ReplyView] = ReplyView if projection else Reply
+        self._context = {"intern": interner} if interner is not None else None
+        self._projection = projection
+        self.limit = limit
+        self.count = 0
+        self.envelope: Optional[RepliesViewResponse] = None
+
+    @property
+    def full(self) -> bool:
+        return self.limit is not None and self.count >= self.limit
+
+    def feed(self, chunk: bytes) -> list[ReplyView]:
+        replies: list[ReplyView] = []
+        for element in self._splitter.feed(chunk):
+            if self.full:
+                break
+            reply = self._model.model_validate_json(element, context=self._context)
+            if self._projection and _pick_first(reply.content) == "":
+                reply.lazy_content_rendered = _Rendered.model_validate_json(element).content_rendered
+            replies.append(reply)
+            self.count += 1
+        return replies
+
+    def finish(self) -> RepliesViewResponse:
+        # The envelope is the page with its result array emptied.
+        self.envelope = _decode(RepliesViewResponse, self._splitter.close())
+        return self.envelope
+
+
+def _stream_done(decoder: _ReplyStreamDecoder, page: int, max_pages: int) -> bool:
+    envelope = decoder.envelope
+    if envelope is None or decoder.count == 0 or page >= max_pages:
+        return True
+    return envelope.pagination is not None and page >= envelope.pagination.pages
+
+
+def _last_reply_page(
+    first: RepliesViewResponse,
+    max_pages: int,
+    max_replies: Optional[int],
+    total_replies: Optional[int],
+) -> Optional[int]:
+    if first.pagination is not None:
+        per_page = first.pagination.per_page
+        pages = first.pagination.pages
+    elif total_replies is not None and first.result:
+        per_page = len(first.result)
+        pages = math.ceil(total_replies / per_page)
+    else:
+        return None
+    last_page = min(max_pages, pages)
+    if max_replies is not None and per_page > 0:
+        last_page = min(last_page, math.ceil(max_replies / per_page))
+    return max(1, last_page)
+
+
+def _rest_pages(first: RepliesViewResponse, max_pages: int, total_replies: Optional[int]) -> Optional[range]:
+    """Reply pages after the first, or None when the page count is unknown."""
+    if not first.result:
+        return range(0)
+    last_page = _last_reply_page(first, max_pages, None, total_replies)
+    return None if last_page is None else range(2, last_page + 1)
+
+
+def _speculative_pages(topic: TopicView, max_pages: int) -> range:
+    # V2EX serves a fixed page size, so Topic.replies predicts the page count
+    # before the first reply page has answered; callers verify it afterwards.
+    pages = math.ceil((topic.replies or 0) / DEFAULT_REPLIES_PER_PAGE)
+    return range(2, min(max_pages, pages) + 1)
+
+
+def _delta_pages(topic: TopicView, covered: int) -> range:
+    """Reply pages from the one holding reply number ``covered`` to the end of the thread."""
+    # Like _speculative_pages, this relies on V2EX serving a fixed page size.
+    last_page = max(1, math.ceil((topic.replies or 0) / DEFAULT_REPLIES_PER_PAGE))
+    first_page = min(last_page, max(1, math.ceil(covered / DEFAULT_REPLIES_PER_PAGE)))
+    return range(first_page, last_page + 1)
+
+
+def _per_page(first: RepliesViewResponse) -> int:
+    if first.pagination is not None and first.pagination.per_page > 0:
+        return first.pagination.per_page
+    return len(first.result) or DEFAULT_REPLIES_PER_PAGE
+
+
+def _sync_pages(topic: TopicView, snapshot: Optional[ThreadSnapshotView], max_pages: int) -> Optional[range]:
+    """Reply pages that can hold replies missing from ``snapshot``.
+
+    Returns None when the snapshot cannot be extended and a full refetch is
+    needed: no snapshot, or replies were deleted so page boundaries moved.
+    A thread touched without a change in its reply count counts as the latter,
+    since a deletion may have been offset by a new reply.
+    """
+    if snapshot is None:
+        return None
+    old = snapshot.topic
+    total = topic.replies or 0
+    old_total = old.replies or 0
+    if total < old_total or (total == old_total and topic.last_touched != old.last_touched):
+        return None
+    per_page = snapshot.per_page
+    stored = len(snapshot.replies)
+    unchanged = (topic.replies, topic.last_touched, topic.last_modified) == (
+        old.replies,
+        old.last_touched,
+        old.last_modified,
+    )
+    if unchanged and stored >= min(total, max_pages * per_page):
+        return range(0)
+    # Start from the last stored page, which may have been partial.
+    first_page = max(1, math.ceil(stored / per_page))
+    last_page = min(max_pages, math.ceil(total / per_page))
+    return range(first_page, last_page + 1)
+
+
+def _merge_replies(stored: Sequence[ReplyView], pages: Iterable[Sequence[ReplyView]]) -> list[ReplyView]:
+    merged = {reply.id: reply for reply in stored}
+    for data in pages:
+        for reply in data:
+            merged[reply.id] = reply
+    return list(merged.values())
+
+
+def _collect_replies(pages: Iterable[Sequence[ReplyView]], max_replies: Optional[int]) -> list[ReplyView]:
+    replies: list[ReplyView] = []
+    for data in pages:
+        if not data:
+            break
+        replies.extend(data)
+        if max_replies is not None and len(replies) >= max_replies:
+            return replies[:max_replies]
+    return replies
+
+
+@dataclass
+class ReplyDelta:
+    """The topic and only the replies after a known reply id, numbered as in the full thread."""
+
+    topic_text: str
+    replies_text: str
+    new_replies: int
+    total_replies: int
+    last_reply_id: Optional[int]
+
+
+@dataclass
+class HostStats:
+    requests: int = 0
+    connections: int = 0
+
+    @property
+    def reused(self) -> int:
+        return max(0, self.requests - self.connections)
+
+
+class ConnectionStats:
+    """Per-host request and new-connection counters, fed by httpcore trace events."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.hosts: dict[str, HostStats] = {}
+
+    def record_request(self, host: str) -> None:
+        with self._lock:
+            self.hosts.setdefault(host, HostStats()).requests += 1
+
+    def record_connection(self, host: str) -> None:
+        with self._lock:
+            self.hosts.setdefault(host, HostStats()).connections += 1
+
+    def summary(self) -> str:
+        with self._lock:
+            return ", ".join(
+                f"{host}: requests={stats.requests} connections={stats.connections} reused={stats.reused}"
+                for host, stats in self.hosts.items()
+            ) or "no requests"
+
+
+class SingleFlight:
+    """Run one call per key at a time; concurrent callers for that key share its result."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._calls: dict[CacheKey, Future[Any]] = {}
+        self.coalesced = 0
+
+    def do(self, key: CacheKey, fn: Callable[[], T]) -> T:
+        with self._lock:
+            future = self._calls.get(key)
+            if future is not None:
+                self.coalesced += 1
+                leader = False
+            else:
+                future = self._calls[key] = Future()
+                leader = True
+        if not leader:
+            return cast(T, future.result())
+        try:
+            result = fn()
+        except BaseException as exc:
+            future.set_exception(exc)
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+        future.set_result(result)
+        return result
+
+
+class AsyncSingleFlight:
+    """asyncio counterpart of SingleFlight."""
+
+    def __init__(self) -> None:
+        self._calls: dict[CacheKey, asyncio.Future[Any]] = {}
+        self.coalesced = 0
+
+    async def do(self, key: CacheKey, fn: Callable[[], Awaitable[T]]) -> T:
+        task = self._calls.get(key)
+        if task is None:
+            task = self._calls[key] = asyncio.ensure_future(fn())
+
+            def forget(done: asyncio.Future[Any]) -> None:
+                if self._calls.get(key) is done:
+                    del self._calls[key]
+
+            task.add_done_callback(forget)
+        else:
+            self.coalesced += 1
+        # Shield so one caller being cancelled does not cancel the shared fetch.
+        return cast(T, await asyncio.shield(task))
+
+
+def _preconnect_request(
+    client: httpx.Client | httpx.AsyncClient,
+    api_base: str,
+    trace: Callable[..., Any],
+) -> httpx.Request:
+    # An unauthenticated HEAD of the host root opens the connection without
+    # touching the API, so it costs no quota and is not logged as an attempt.
+    url = httpx.URL(api_base).copy_with(path="/", query=None)
+    request = client.build_request("HEAD", url, extensions={"trace": trace})
+    del request.headers["Authorization"]
+    return request
+
+
+def _http2_available(http2: bool) -> bool:
+    if not http2:
+        return False
+    try:
+        import h2  # type: ignore[import-not-found]  # noqa: F401
+    except ImportError:
+        logger.warning("HTTP/2 requested but h2 is not installed (pip install 'httpx[http2]'); using HTTP/1.1")
+        return False
+    return True
+
+
+class _V2EXClientBase(ABC):
+    """Configuration and formatting shared by the sync and async clients.
+
+    With ``projection=True`` responses decode into TopicView / ReplyView, which
+    keep only the fields formatting and sync read, and the rendered HTML is
+    decoded only for items whose content is empty. Fetch methods are typed with
+    the views either way; without projection they return Topic / Reply.
+    """
+
+    def __init__(
+        self,
+        token: str,
+        api_base: str = API_BASE,
+        max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+        limits: httpx.Limits = DEFAULT_LIMITS,
+        http2: bool = False,
+        timeout: float = DEFAULT_TIMEOUT,
+        cache: Optional[ResponseCache] = None,
+        rate_limiter: Optional[RateLimiter] = None,
+        retry_policy: Optional[RetryPolicy] = None,
+        interner: Optional[InternPool] = None,
+        projection: bool = False,
+    ) -> None:
         self.token = token
         self.api_base = api_base
+        self.max_concurrency = max(1, max_concurrency)
+        self.limits = limits
+        self.http2 = _http2_available(http2)
+        self.timeout = timeout
+        self.connection_stats = ConnectionStats()
+        self.cache = cache
+        self.rate_limiter = rate_limiter if rate_limiter is not None else RateLimiter()
+        self.retry_policy = retry_policy if retry_policy is not None else RetryPolicy()
+        self.attempt_log = AttemptLog()
+        self.interner = interner if interner is not None else InternPool()
+        self.projection = projection
+        self._open()
+
+    @abstractmethod
+    def _open(self) -> None: ...
+
+    def _client_options(self) -> dict[str, Any]:
+        return {
+            "headers": self._headers(),
+            "limits": self.limits,
+            "http2": self.http2,
+            "timeout": self.timeout,
+        }
 
     def _headers(self) -> dict[str, str]:
         return {"Authorization": f"Bearer {self.token}"}
 
-    def fetch_topic(self, client: httpx.Client, topic_id: int) -> Topic:
-        logger.info("Fetching V2EX topic %s", topic_id)
-        response = client.get(
-            f"{self.api_base}/topics/{topic_id}",
-            headers=self._headers(),
-            timeout=20.0,
-        )
-        logger.info("V2EX topic response status=%s", response.status_code)
-        logger.debug("V2EX topic response body=%s", response.text)
-        response.raise_for_status()
-        payload = response.json()
-        _ensure_success(payload)
-        return TopicResponse.model_validate(payload).result
+    def _load_snapshot(self, topic_id: int) -> Optional[ThreadSnapshotView]:
+        if self.cache is None:
+            return None
+        body = self.cache.load_thread(topic_id)
+        if body is None:
+            return None
+        model = ThreadSnapshotView if self.projection else ThreadSnapshot
+        return model.model_validate_json(body, context={"intern": self.interner})
 
-    def fetch_replies(
-        self,
-        client: httpx.Client,
-        topic_id: int,
-        max_pages: int,
-        max_replies: Optional[int],
-    ) -> list[Reply]:
-        replies: list[Reply] = []
-        page = 1
-        while page <= max_pages:
-            logger.info("Fetching V2EX replies topic=%s page=%s", topic_id, page)
-            response = client.get(
-                f"{self.api_base}/topics/{topic_id}/replies",
-                headers=self._headers(),
-                params={"p": page},
-                timeout=20.0,
-            )
-            logger.info("V2EX replies response status=%s page=%s", response.status_code, page)
-            logger.debug("V2EX replies response body page=%s body=%s", page, response.text)
-            response.raise_for_status()
-            payload = response.json()
-            _ensure_success(payload)
-            reply_response = RepliesResponse.model_validate(payload)
-            data = reply_response.result
-            if not data:
-                break
-            replies.extend(data)
-            if max_replies is not None and len(replies) >= max_replies:
-                replies = replies[:max_replies]
-                break
-            page += 1
-        return replies
+    def _save_snapshot(self, topic: TopicView, replies: Sequence[ReplyView], per_page: int) -> None:
+        if self.cache is None:
+            return
+        snapshot = ThreadSnapshotView(topic=topic, replies=replies, per_page=per_page)
+        # Serialize the runtime models, so a full Topic / Reply keeps its extra fields.
+        self.cache.save_thread(topic.id, snapshot.model_dump_json(serialize_as_any=True).encode("utf-8"))
 
-    def format_topic(self, topic: Topic, max_chars: Optional[int]) -> str:
+    def format_topic(self, topic: TopicView, max_chars: Optional[int]) -> str:
         title = _pick_first(topic.title)
-        content = _pick_first(topic.content, topic.content_rendered)
+        content = _pick_first(topic.content, topic.rendered)
         node = _pick_first(
             topic.node.title if topic.node else None,
             topic.node.name if topic.node else None,
@@ -190,45 +822,1020 @@ class V2EXClient:
 
     def format_replies(
         self,
-        replies: Iterable[Reply],
+        replies: Iterable[ReplyView] | ReplyBatch,
         max_chars: Optional[int],
     ) -> str:
-        lines: list[str] = []
-        for idx, reply in enumerate(replies, start=1):
-            author = _pick_first(
-                reply.member.username if reply.member else None,
-                reply.member.name if reply.member else None,
-                reply.member.id if reply.member else None,
+        out = io.StringIO()
+        _write_replies(out.write, replies, max_chars)
+        return out.getvalue().strip()
+
+    def format_bundle(self, topic: TopicView, replies: Iterable[ReplyView] | ReplyBatch) -> str:
+        out = io.StringIO()
+        _write_bundle_head(out.write, self.format_topic(topic, None))
+        if _write_replies(out.write, replies, None) == 1:
+            out.write("No replies.")
+        return out.getvalue().strip()
+
+    def format_budgeted_bundle(
+        self,
+        topic: TopicView,
+        replies: Iterable[ReplyView] | ReplyBatch,
+        token_budget: int,
+        counter: Optional[TokenCounter] = None,
+    ) -> tuple[str, BudgetReport]:
+        """Format the bundle to fit ``token_budget`` tokens.
+
+        The topic is always kept, truncated to half the budget if needed.
+        Replies are taken in thread order and any reply that no longer fits is
+        skipped, so the selection is deterministic. Kept replies keep their
+        thread numbers and a closing line says how many were left out.
+        """
+        counter = counter if counter is not None else TokenCounter()
+        topic_text = self.format_topic(topic, None)
+        topic_truncated = False
+        max_chars = len(_pick_first(topic.content, topic.rendered))
+        while counter.count(topic_text) > token_budget // 2 and max_chars > 3:
+            max_chars //= 2
+            topic_text = self.format_topic(topic, max_chars)
+            topic_truncated = True
+        out = io.StringIO()
+        _write_bundle_head(out.write, topic_text)
+        remaining = token_budget - counter.count(out.getvalue()) - OMISSION_RESERVE
+        separator = ""
+        total = kept = 0
+        for total, (author, created, content) in enumerate(_reply_fields(replies), start=1):
+            block = separator + _reply_block(total, author, created, content)
+            cost = counter.count(block)
+            if cost > remaining:
+                continue
+            out.write(block)
+            remaining -= cost
+            separator = "\n\n"
+            kept += 1
+        if not total:
+            out.write("No replies.")
+        elif kept < total:
+            out.write(f"{separator}[{total - kept} of {total} replies omitted to fit the token budget]")
+        bundle = out.getvalue().strip()
+        report = BudgetReport(
+            budget=token_budget,
+            used=counter.count(bundle),
+            replies_total=total,
+            replies_kept=kept,
+            topic_truncated=topic_truncated,
+            exact=counter.exact,
+        )
+        return bundle, report
+
+    def format_reply_chunks(
+        self,
+        replies: Iterable[ReplyView] | ReplyBatch,
+        chunk_tokens: int,
+        counter: Optional[TokenCounter] = None,
+    ) -> list[str]:
+        """Split the reply blocks into chunks of at most ``chunk_tokens`` tokens.
+
+        Blocks keep their thread numbers and are never split across chunks; a
+        reply too long for a chunk on its own is truncated until it fits.
+        """
+        counter = counter if counter is not None else TokenCounter()
+        chunks: list[str] = []
+        out = io.StringIO()
+        used = 0
+        for idx, (author, created, content) in enumerate(_reply_fields(replies), start=1):
+            block = _reply_block(idx, author, created, content)
+            cost = counter.count(block)
+            max_chars = len(content)
+            while cost > chunk_tokens and max_chars > 3:
+                max_chars //= 2
+                block = _reply_block(idx, author, created, _truncate(content, max_chars))
+                cost = counter.count(block)
+            if used and used + 1 + cost > chunk_tokens:
+                chunks.append(out.getvalue())
+                out = io.StringIO()
+                used = 0
+            if used:
+                out.write("\n\n")
+                used += 1
+            out.write(block)
+            used += cost
+        if used:
+            chunks.append(out.getvalue())
+        return chunks
+
+    def format_reply_delta(
+        self,
+        topic: TopicView,
+        replies: Sequence[ReplyView],
+        after_id: Optional[int],
+        offset: int = 0,
+    ) -> ReplyDelta:
+        """Format the replies posted after reply ``after_id`` (all of them when None).
+
+        ``offset`` is the number of replies in the thread before ``replies[0]``.
+        """
+        start = 0
+        if after_id is not None:
+            start = next((idx for idx, reply in enumerate(replies) if reply.id > after_id), len(replies))
+        text, _ = self._format_page(replies[start:], offset + start + 1)
+        return ReplyDelta(
+            topic_text=self.format_topic(topic, None),
+            # Pages after the first open with a separator; this text stands alone.
+            replies_text=text.strip(),
+            new_replies=len(replies) - start,
+            total_replies=offset + len(replies),
+            last_reply_id=replies[-1].id if replies else after_id,
+        )
+
+    def _format_head(self, topic: TopicView) -> str:
+        out = io.StringIO()
+        _write_bundle_head(out.write, self.format_topic(topic, None))
+        return out.getvalue()
+
+    def _format_page(self, replies: Iterable[ReplyView], start: int) -> tuple[str, int]:
+        """Format one page of reply blocks numbered from ``start``; returns the text and the next number."""
+        out = io.StringIO()
+        number = _write_replies(out.write, replies, None, start)
+        return out.getvalue(), number
+
+
+class V2EXClient(_V2EXClientBase):
+    _client: httpx.Client
+
+    def _open(self) -> None:
+        self._client = httpx.Client(**self._client_options())
+        self.flights = SingleFlight()
+        # Built up front because _send_once runs on many threads; the pool
+        # only starts worker threads once a request is actually hedged.
+        self._hedge_pool = ThreadPoolExecutor(max_workers=self.max_concurrency * 2)
+
+    def __enter__(self) -> "V2EXClient":
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Optional[type[BaseException]],
+        exc: Optional[BaseException],
+        tb: Optional[TracebackType],
+    ) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self._hedge_pool.shutdown(wait=False, cancel_futures=True)
+        self._client.close()
+
+    def preconnect(self) -> None:
+        """Open a keep-alive connection to the API host ahead of the first real request."""
+        host = httpx.URL(self.api_base).host
+        stats = self.connection_stats
+
+        def trace(event: str, info: dict[str, Any]) -> None:
+            if event == "connection.connect_tcp.complete":
+                stats.record_connection(host)
+
+        try:
+            self._client.send(_preconnect_request(self._client, self.api_base, trace))
+        except httpx.HTTPError as exc:
+            logger.warning("V2EX preconnect failed: %s", exc)
+
+    def _get(
+        self,
+        url: str,
+        params: Optional[dict[str, Any]] = None,
+        headers: Optional[dict[str, str]] = None,
+        attempt: int = 1,
+        hedged: bool = False,
+        stream: bool = False,
+    ) -> httpx.Response:
+        host = httpx.URL(url).host
+        stats = self.connection_stats
+
+        def trace(event: str, info: dict[str, Any]) -> None:
+            if event == "connection.connect_tcp.complete":
+                stats.record_connection(host)
+
+        while (delay := self.rate_limiter.try_acquire()) > 0:
+            logger.debug("Pacing V2EX request for %.2fs to stay within quota", delay)
+            time.sleep(delay)
+        stats.record_request(host)
+        started = time.perf_counter()
+        try:
+            request = self._client.build_request(
+                "GET", url, params=params, headers=headers, extensions={"trace": trace}
             )
-            created = _pick_first(reply.created, reply.created_at)
-            content = _pick_first(reply.content, reply.content_rendered)
-            block = "\n".join(
-                [
-                    f"[{idx}] Author: {author}",
-                    f"Created: {created}",
-                    f"Content:\n{_truncate(content, max_chars)}",
-                ]
+            response = self._client.send(request, stream=stream)
+        except BaseException as exc:
+            self.rate_limiter.release()
+            elapsed = time.perf_counter() - started
+            self.attempt_log.record(Attempt(url, attempt, hedged, elapsed, error=type(exc).__name__))
+            raise
+        elapsed = time.perf_counter() - started
+        self.attempt_log.record(Attempt(url, attempt, hedged, elapsed, status=response.status_code))
+        self.rate_limiter.update(response.headers, response.status_code)
+        return response
+
+    def _send_once(
+        self,
+        url: str,
+        params: Optional[dict[str, Any]],
+        headers: Optional[dict[str, str]],
+        attempt: int,
+    ) -> httpx.Response:
+        hedge_after = self.retry_policy.hedge_delay(self.attempt_log)
+        if hedge_after is None:
+            return self._get(url, params, headers, attempt)
+        primary = self._hedge_pool.submit(self._get, url, params, headers, attempt)
+        done, _ = wait([primary], timeout=hedge_after)
+        if done:
+            return primary.result()
+        logger.debug("Hedging V2EX request %s after %.3fs", url, hedge_after)
+        pending: set[Future[httpx.Response]] = {
+            primary,
+            self._hedge_pool.submit(self._get, url, params, headers, attempt, True),
+        }
+        while True:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            # The slower duplicate is left to finish in the background.
+            for future in done:
+                if future.exception() is None:
+                    return future.result()
+            if not pending:
+                return next(iter(done)).result()
+
+    def _send(
+        self,
+        url: str,
+        params: Optional[dict[str, Any]] = None,
+        headers: Optional[dict[str, str]] = None,
+        stream: bool = False,
+    ) -> httpx.Response:
+        """Send a GET with retries. A streamed response is returned unread and never hedged."""
+        started = time.perf_counter()
+        attempt = 1
+        while True:
+            try:
+                if stream:
+                    response = self._get(url, params, headers, attempt, stream=True)
+                else:
+                    response = self._send_once(url, params, headers, attempt)
+            except httpx.TransportError as exc:
+                delay = self.retry_policy.retry_delay(attempt, error=exc)
+                if delay is None:
+                    raise
+            else:
+                delay = self.retry_policy.retry_delay(attempt, response=response)
+                if delay is None:
+                    self.attempt_log.record_request(time.perf_counter() - started)
+                    return response
+                response.close()
+            time.sleep(delay)
+            attempt += 1
+
+    def _fetch(
+        self,
+        key: CacheKey,
+        url: str,
+        params: Optional[dict[str, Any]] = None,
+        revalidate: bool = False,
+    ) -> httpx.Response:
+        if self.cache is None:
+            return self._send(url, params)
+        request = self._client.build_request("GET", url, params=params)
+        lookup = self.cache.lookup(key, request, revalidate=revalidate)
+        if lookup.response is not None:
+            return lookup.response
+        response = self._send(url, params, headers=lookup.headers)
+        return self.cache.resolve(lookup, response)
+
+    def fetch_topic(self, topic_id: int, revalidate: bool = False) -> TopicView:
+        return self.flights.do((topic_id, TOPIC_PAGE), lambda: self._load_topic(topic_id, revalidate))
+
+    def _load_topic(self, topic_id: int, revalidate: bool) -> TopicView:
+        logger.info("Fetching V2EX topic %s", topic_id)
+        response = self._fetch(
+            (topic_id, TOPIC_PAGE),
+            f"{self.api_base}/topics/{topic_id}",
+            revalidate=revalidate,
+        )
+        return _parse_topic_response(response, self.interner, self.projection)
+
+    def fetch_replies_page(self, topic_id: int, page: int, revalidate: bool = False) -> RepliesViewResponse:
+        return self.flights.do((topic_id, page), lambda: self._load_replies_page(topic_id, page, revalidate))
+
+    def _load_replies_page(self, topic_id: int, page: int, revalidate: bool) -> RepliesViewResponse:
+        logger.info("Fetching V2EX replies topic=%s page=%s", topic_id, page)
+        response = self._fetch(
+            (topic_id, page),
+            f"{self.api_base}/topics/{topic_id}/replies",
+            params={"p": page},
+            revalidate=revalidate,
+        )
+        return _parse_replies_response(response, page, self.interner, self.projection)
+
+    def stream_replies_page(self, topic_id: int, page: int) -> Iterator[ReplyView]:
+        """Yield a reply page's replies as they are parsed off the wire.
+
+        Only the reply being read is buffered. Streaming bypasses the response
+        cache, which stores whole bodies.
+        """
+        yield from self._stream_page(topic_id, page, _ReplyStreamDecoder(self.interner, self.projection))
+
+    def stream_replies(self, topic_id: int, max_pages: int, max_replies: Optional[int] = None) -> Iterator[ReplyView]:
+        """Stream replies page after page until the thread, max_pages or max_replies ends."""
+        remaining = max_replies
+        for page in range(1, max_pages + 1):
+            decoder = _ReplyStreamDecoder(self.interner, self.projection, remaining)
+            yield from self._stream_page(topic_id, page, decoder)
+            if remaining is not None:
+                remaining -= decoder.count
+            if _stream_done(decoder, page, max_pages) or remaining == 0:
+                return
+
+    def _stream_page(self, topic_id: int, page: int, decoder: _ReplyStreamDecoder) -> Iterator[ReplyView]:
+        logger.info("Streaming V2EX replies topic=%s page=%s", topic_id, page)
+        response = self._send(f"{self.api_base}/topics/{topic_id}/replies", {"p": page}, stream=True)
+        try:
+            logger.info("V2EX replies response status=%s page=%s", response.status_code, page)
+            response.raise_for_status()
+            for chunk in response.iter_bytes():
+                yield from decoder.feed(chunk)
+                if decoder.full:
+                    return
+            decoder.finish()
+        finally:
+            response.close()
+
+    def fetch_replies(
+        self,
+        topic_id: int,
+        max_pages: int,
+        max_replies: Optional[int],
+        total_replies: Optional[int] = None,
+    ) -> list[ReplyView]:
+        if max_pages < 1:
+            return []
+        first = self.fetch_replies_page(topic_id, 1)
+        last_page = _last_reply_page(first, max_pages, max_replies, total_replies)
+        if last_page is None:
+            return self._walk_replies(topic_id, first, max_pages, max_replies)
+        pages = [first.result]
+        if first.result:
+            pages.extend(self._fetch_pages(topic_id, range(2, last_page + 1)))
+        return _collect_replies(pages, max_replies)
+
+    def _fetch_pages(self, topic_id: int, pages: range, revalidate: bool = False) -> list[Sequence[ReplyView]]:
+        if not pages:
+            return []
+        # Pages are independent once the page count is known, so fan them out
+        # and let map() hand them back in page order.
+        with ThreadPoolExecutor(max_workers=min(self.max_concurrency, len(pages))) as executor:
+            return list(
+                executor.map(
+                    lambda page: self.fetch_replies_page(topic_id, page, revalidate=revalidate).result,
+                    pages,
+                )
             )
-            lines.append(block)
-        return "\n\n".join(lines).strip()
-
-    def build_bundle(self, topic_id: int, max_pages: int) -> str:
-        with httpx.Client() as client:
-            topic = self.fetch_topic(client, topic_id)
-            replies = self.fetch_replies(
-                client,
-                topic_id,
-                max_pages=max_pages,
-                max_replies=None,
+
+    def fetch_reply_batch(
+        self,
+        topic_id: int,
+        max_pages: int,
+        total_replies: Optional[int] = None,
+    ) -> ReplyBatch:
+        """Fetch replies into a columnar ReplyBatch, converting each page as it arrives."""
+        batch = ReplyBatch()
+        if max_pages < 1:
+            return batch
+        first = self.fetch_replies_page(topic_id, 1)
+        batch.extend(first.result)
+        pages = _rest_pages(first, max_pages, total_replies)
+        if pages is None:
+            batch.extend(self._walk_replies(topic_id, first, max_pages, None)[len(first.result) :])
+            return batch
+        if not pages:
+            return batch
+        with ThreadPoolExecutor(max_workers=min(self.max_concurrency, len(pages))) as executor:
+            # map() yields in page order, so each page is folded in and dropped.
+            for data in executor.map(lambda page: self.fetch_replies_page(topic_id, page).result, pages):
+                if not data:
+                    break
+                batch.extend(data)
+        return batch
+
+    def sync_replies(self, topic: TopicView, max_pages: int) -> list[ReplyView]:
+        """Bring the stored reply list for ``topic`` up to date, fetching only tail pages."""
+        if self.cache is None:
+            return self.fetch_replies(topic.id, max_pages, None, total_replies=topic.replies)
+        snapshot = self._load_snapshot(topic.id)
+        pages = _sync_pages(topic, snapshot, max_pages)
+        if snapshot is None or pages is None:
+            first = self.fetch_replies_page(topic.id, 1, revalidate=True)
+            per_page = _per_page(first)
+            last_page = _last_reply_page(first, max_pages, None, topic.replies) or 1
+            fetched = [first.result]
+            if first.result:
+                fetched.extend(self._fetch_pages(topic.id, range(2, last_page + 1), revalidate=True))
+            replies = _collect_replies(fetched, None)
+        else:
+            logger.info("Syncing V2EX replies topic=%s pages=%s", topic.id, list(pages))
+            per_page = snapshot.per_page
+            replies = _merge_replies(snapshot.replies, self._fetch_pages(topic.id, pages, revalidate=True))
+        self._save_snapshot(topic, replies, per_page)
+        return replies[: max_pages * per_page]
+
+    def _walk_replies(
+        self,
+        topic_id: int,
+        first: RepliesViewResponse,
+        max_pages: int,
+        max_replies: Optional[int],
+    ) -> list[ReplyView]:
+        # Without pagination metadata the page count is unknown; fall back to
+        # walking pages until an empty one.
+        replies: list[ReplyView] = []
+        data = first.result
+        page = 1
+        while data:
+            replies.extend(data)
+            if max_replies is not None and len(replies) >= max_replies:
+                return replies[:max_replies]
+            page += 1
+            if page > max_pages:
+                break
+            data = self.fetch_replies_page(topic_id, page).result
+        return replies
+
+    def fetch_bundle(self, topic_id: int, max_pages: int) -> tuple[TopicView, list[ReplyView]]:
+        """Fetch the topic and its replies with the topic and first page in parallel."""
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            topic_future = executor.submit(self.fetch_topic, topic_id)
+            if max_pages < 1:
+                return topic_future.result(), []
+            first_future = executor.submit(self.fetch_replies_page, topic_id, 1)
+            head: list[Future[Any]] = [topic_future, first_future]
+            done, _ = wait(head, return_when=FIRST_COMPLETED)
+            # Start the remaining pages from whichever answer arrives first.
+            if first_future in done:
+                pages = _rest_pages(first_future.result(), max_pages, None)
+            else:
+                pages = _speculative_pages(topic_future.result(), max_pages)
+            rest_future = executor.submit(self._fetch_pages, topic_id, pages or range(0))
+            topic = topic_future.result()
+            first = first_future.result()
+            expected = _rest_pages(first, max_pages, topic.replies)
+            if expected is None:
+                return topic, self._walk_replies(topic_id, first, max_pages, None)
+            rest = rest_future.result() if expected == pages else self._fetch_pages(topic_id, expected)
+        return topic, _collect_replies([first.result, *rest], None)
+
+    def iter_bundle_chunks(self, topic_id: int, max_pages: int) -> Iterator[str]:
+        """Yield the bundle while it is fetched: the topic header, then one chunk per reply page.
+
+        Pages are fetched in order with at most ``max_concurrency`` in flight.
+        Joined, the chunks equal ``build_bundle(topic_id, max_pages)``.
+        """
+        trim = TrailingTrim()
+        for chunk in self._bundle_chunks(topic_id, max_pages):
+            if text := trim.push(chunk):
+                yield text
+
+    def spool_bundle(self, topic_id: int, max_pages: int, directory: Optional[str] = None) -> BundleSpool:
+        """Format the bundle into a temporary file one page at a time.
+
+        At most ``max_concurrency`` pages are held in memory, however long the
+        thread. Read it back with ``read()`` or ``iter_chunks()`` and close it.
+        """
+        spool = BundleSpool(directory)
+        try:
+            for chunk in self._bundle_chunks(topic_id, max_pages):
+                spool.write(chunk)
+        except BaseException:
+            spool.close()
+            raise
+        return spool
+
+    def _bundle_chunks(self, topic_id: int, max_pages: int) -> Iterator[str]:
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            topic_future = executor.submit(self.fetch_topic, topic_id)
+            first_future = executor.submit(self.fetch_replies_page, topic_id, 1) if max_pages >= 1 else None
+            topic = topic_future.result()
+            yield self._format_head(topic)
+            first = first_future.result() if first_future is not None else RepliesViewResponse(success=True)
+        text, number = self._format_page(first.result, 1)
+        yield text
+        if first.result:
+            pages = _rest_pages(first, max_pages, topic.replies)
+            window = self.max_concurrency
+            if pages is None:
+                # Without pagination metadata, walk pages one by one until an empty one.
+                pages, window = range(2, max_pages + 1), 1
+            for data in self._iter_pages(topic_id, pages, window):
+                text, number = self._format_page(data, number)
+                yield text
+        if number == 1:
+            yield "No replies."
+
+    def _iter_pages(self, topic_id: int, pages: range, window: int) -> Iterator[Sequence[ReplyView]]:
+        """Yield reply pages in order with at most ``window`` fetches in flight."""
+        if not pages:
+            return
+        pending = iter(pages)
+        with ThreadPoolExecutor(max_workers=window) as executor:
+            futures = deque(
+                executor.submit(self.fetch_replies_page, topic_id, page) for page in islice(pending, window)
             )
-        topic_text = self.format_topic(topic, None)
-        replies_text = self.format_replies(replies, None)
-        return "\n\n".join(
-            [
-                "文章内容（主题）:",
-                topic_text or "N/A",
-                "",
-                "评论:",
-                replies_text or "No replies.",
-            ]
-        ).strip()
+            try:
+                while futures:
+                    data = futures.popleft().result().result
+                    if not data:
+                        return
+                    for page in islice(pending, 1):
+                        futures.append(executor.submit(self.fetch_replies_page, topic_id, page))
+                    yield data
+            finally:
+                for future in futures:
+                    future.cancel()
+
+    def build_bundle(self, topic_id: int, max_pages: int, incremental: bool = False) -> str:
+        return self.format_bundle(*self._load_thread(topic_id, max_pages, incremental))
+
+    def _load_thread(self, topic_id: int, max_pages: int, incremental: bool) -> tuple[TopicView, list[ReplyView]]:
+        """The topic and its replies, synced against the stored snapshot when ``incremental``."""
+        if not incremental:
+            return self.fetch_bundle(topic_id, max_pages)
+        topic = self.fetch_topic(topic_id, revalidate=True)
+        return topic, self.sync_replies(topic, max_pages)
+
+
+class AsyncV2EXClient(_V2EXClientBase):
+    _client: httpx.AsyncClient
+
+    def _open(self) -> None:
+        self._client = httpx.AsyncClient(**self._client_options())
+        self.flights = AsyncSingleFlight()
+
+    async def __aenter__(self) -> "AsyncV2EXClient":
+        return self
+
+    async def __aexit__(
+        self,
+        exc_type: Optional[type[BaseException]],
+        exc: Optional[BaseException],
+        tb: Optional[TracebackType],
+    ) -> None:
+        await self.aclose()
+
+    async def aclose(self) -> None:
+        await self._client.aclose()
+
+    async def preconnect(self) -> None:
+        """Open a keep-alive connection to the API host ahead of the first real request."""
+        host = httpx.URL(self.api_base).host
+        stats = self.connection_stats
+
+        async def trace(event: str, info: dict[str, Any]) -> None:
+            if event == "connection.connect_tcp.complete":
+                stats.record_connection(host)
+
+        try:
+            await self._client.send(_preconnect_request(self._client, self.api_base, trace))
+        except httpx.HTTPError as exc:
+            logger.warning("V2EX preconnect failed: %s", exc)
+
+    async def _get(
+        self,
+        url: str,
+        params: Optional[dict[str, Any]] = None,
+        headers: Optional[dict[str, str]] = None,
+        attempt: int = 1,
+        hedged: bool = False,
+        stream: bool = False,
+    ) -> httpx.Response:
+        host = httpx.URL(url).host
+        stats = self.connection_stats
+
+        async def trace(event: str, info: dict[str, Any]) -> None:
+            if event == "connection.connect_tcp.complete":
+                stats.record_connection(host)
+
+        while (delay := self.rate_limiter.try_acquire()) > 0:
+            logger.debug("Pacing V2EX request for %.2fs to stay within quota", delay)
+            await asyncio.sleep(delay)
+        stats.record_request(host)
+        started = time.perf_counter()
+        try:
+            request = self._client.build_request(
+                "GET", url, params=params, headers=headers, extensions={"trace": trace}
+            )
+            response = await self._client.send(request, stream=stream)
+        except BaseException as exc:
+            self.rate_limiter.release()
+            elapsed = time.perf_counter() - started
+            self.attempt_log.record(Attempt(url, attempt, hedged, elapsed, error=type(exc).__name__))
+            raise
+        elapsed = time.perf_counter() - started
+        self.attempt_log.record(Attempt(url, attempt, hedged, elapsed, status=response.status_code))
+        self.rate_limiter.update(response.headers, response.status_code)
+        return response
+
+    async def _send_once(
+        self,
+        url: str,
+        params: Optional[dict[str, Any]],
+        headers: Optional[dict[str, str]],
+        attempt: int,
+    ) -> httpx.Response:
+        hedge_after = self.retry_policy.hedge_delay(self.attempt_log)
+        if hedge_after is None:
+            return await self._get(url, params, headers, attempt)
+        primary = asyncio.ensure_future(self._get(url, params, headers, attempt))
+        done, _ = await asyncio.wait({primary}, timeout=hedge_after)
+        if done:
+            return primary.result()
+        logger.debug("Hedging V2EX request %s after %.3fs", url, hedge_after)
+        pending = {primary, asyncio.ensure_future(self._get(url, params, headers, attempt, True))}
+        try:
+            while True:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                if not pending:
+                    return next(iter(done)).result()
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def _send(
+        self,
+        url: str,
+        params: Optional[dict[str, Any]] = None,
+        headers: Optional[dict[str, str]] = None,
+        stream: bool = False,
+    ) -> httpx.Response:
+        """Send a GET with retries. A streamed response is returned unread and never hedged."""
+        started = time.perf_counter()
+        attempt = 1
+        while True:
+            try:
+                if stream:
+                    response = await self._get(url, params, headers, attempt, stream=True)
+                else:
+                    response = await self._send_once(url, params, headers, attempt)
+            except httpx.TransportError as exc:
+                delay = self.retry_policy.retry_delay(attempt, error=exc)
+                if delay is None:
+                    raise
+            else:
+                delay = self.retry_policy.retry_delay(attempt, response=response)
+                if delay is None:
+                    self.attempt_log.record_request(time.perf_counter() - started)
+                    return response
+                await response.aclose()
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    async def _fetch(
+        self,
+        key: CacheKey,
+        url: str,
+        params: Optional[dict[str, Any]] = None,
+        revalidate: bool = False,
+    ) -> httpx.Response:
+        if self.cache is None:
+            return await self._send(url, params)
+        request = self._client.build_request("GET", url, params=params)
+        # SQLite I/O runs in a worker thread so cache hits and stores never block the event loop.
+        lookup = await asyncio.to_thread(self.cache.lookup, key, request, revalidate)
+        if lookup.response is not None:
+            return lookup.response
+        response = await self._send(url, params, headers=lookup.headers)
+        return await asyncio.to_thread(self.cache.resolve, lookup, response)
+
+    async def fetch_topic(self, topic_id: int, revalidate: bool = False) -> TopicView:
+        return await self.flights.do((topic_id, TOPIC_PAGE), lambda: self._load_topic(topic_id, revalidate))
+
+    async def _load_topic(self, topic_id: int, revalidate: bool) -> TopicView:
+        logger.info("Fetching V2EX topic %s", topic_id)
+        response = await self._fetch(
+            (topic_id, TOPIC_PAGE),
+            f"{self.api_base}/topics/{topic_id}",
+            revalidate=revalidate,
+        )
+        return _parse_topic_response(response, self.interner, self.projection)
+
+    async def fetch_replies_page(
+        self,
+        topic_id: int,
+        page: int,
+        revalidate: bool = False,
+    ) -> RepliesViewResponse:
+        return await self.flights.do(
+            (topic_id, page),
+            lambda: self._load_replies_page(topic_id, page, revalidate),
+        )
+
+    async def _load_replies_page(self, topic_id: int, page: int, revalidate: bool) -> RepliesViewResponse:
+        logger.info("Fetching V2EX replies topic=%s page=%s", topic_id, page)
+        response = await self._fetch(
+            (topic_id, page),
+            f"{self.api_base}/topics/{topic_id}/replies",
+            params={"p": page},
+            revalidate=revalidate,
+        )
+        return _parse_replies_response(response, page, self.interner, self.projection)
+
+    async def stream_replies_page(self, topic_id: int, page: int) -> AsyncIterator[ReplyView]:
+        """Yield a reply page's replies as they are parsed off the wire.
+
+        Only the reply being read is buffered. Streaming bypasses the response
+        cache, which stores whole bodies.
+        """
+        async for reply in self._stream_page(topic_id, page, _ReplyStreamDecoder(self.interner, self.projection)):
+            yield reply
+
+    async def stream_replies(
+        self,
+        topic_id: int,
+        max_pages: int,
+        max_replies: Optional[int] = None,
+    ) -> AsyncIterator[ReplyView]:
+        """Stream replies page after page until the thread, max_pages or max_replies ends."""
+        remaining = max_replies
+        for page in range(1, max_pages + 1):
+            decoder = _ReplyStreamDecoder(self.interner, self.projection, remaining)
+            async for reply in self._stream_page(topic_id, page, decoder):
+                yield reply
+            if remaining is not None:
+                remaining -= decoder.count
+            if _stream_done(decoder, page, max_pages) or remaining == 0:
+                return
+
+    async def _stream_page(self, topic_id: int, page: int, decoder: _ReplyStreamDecoder) -> AsyncIterator[ReplyView]:
+        logger.info("Streaming V2EX replies topic=%s page=%s", topic_id, page)
+        response = await self._send(f"{self.api_base}/topics/{topic_id}/replies", {"p": page}, stream=True)
+        try:
+            logger.info("V2EX replies response status=%s page=%s", response.status_code, page)
+            response.raise_for_status()
+            async for chunk in response.aiter_bytes():
+                for reply in decoder.feed(chunk):
+                    yield reply
+                if decoder.full:
+                    return
+            decoder.finish()
+        finally:
+            await response.aclose()
+
+    async def fetch_replies(
+        self,
+        topic_id: int,
+        max_pages: int,
+        max_replies: Optional[int],
+        total_replies: Optional[int] = None,
+    ) -> list[ReplyView]:
+        if max_pages < 1:
+            return []
+        first = await self.fetch_replies_page(topic_id, 1)
+        last_page = _last_reply_page(first, max_pages, max_replies, total_replies)
+        if last_page is None:
+            return await self._walk_replies(topic_id, first, max_pages, max_replies)
+        pages = [first.result]
+        if first.result:
+            pages.extend(await self._fetch_pages(topic_id, range(2, last_page + 1)))
+        return _collect_replies(pages, max_replies)
+
+    async def _fetch_pages(self, topic_id: int, pages: range, revalidate: bool = False) -> list[Sequence[ReplyView]]:
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def fetch_page(page: int) -> Sequence[ReplyView]:
+            async with semaphore:
+                return (await self.fetch_replies_page(topic_id, page, revalidate=revalidate)).result
+
+        return list(await asyncio.gather(*(fetch_page(page) for page in pages)))
+
+    async def fetch_reply_batch(
+        self,
+        topic_id: int,
+        max_pages: int,
+        total_replies: Optional[int] = None,
+    ) -> ReplyBatch:
+        """Fetch replies into a columnar ReplyBatch, converting each page as it arrives."""
+        batch = ReplyBatch()
+        if max_pages < 1:
+            return batch
+        first = await self.fetch_replies_page(topic_id, 1)
+        batch.extend(first.result)
+        pages = _rest_pages(first, max_pages, total_replies)
+        if pages is None:
+            batch.extend((await self._walk_replies(topic_id, first, max_pages, None))[len(first.result) :])
+            return batch
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def fetch_page(page: int) -> Sequence[ReplyView]:
+            async with semaphore:
+                return (await self.fetch_replies_page(topic_id, page)).result
+
+        tasks = [asyncio.ensure_future(fetch_page(page)) for page in pages]
+        try:
+            for task in tasks:
+                data = await task
+                if not data:
+                    break
+                batch.extend(data)
+        finally:
+            for task in tasks:
+                task.cancel()
+        return batch
+
+    async def sync_replies(self, topic: TopicView, max_pages: int) -> list[ReplyView]:
+        """Bring the stored reply list for ``topic`` up to date, fetching only tail pages."""
+        if self.cache is None:
+            return await self.fetch_replies(topic.id, max_pages, None, total_replies=topic.replies)
+        snapshot = await asyncio.to_thread(self._load_snapshot, topic.id)
+        pages = _sync_pages(topic, snapshot, max_pages)
+        if snapshot is None or pages is None:
+            first = await self.fetch_replies_page(topic.id, 1, revalidate=True)
+            per_page = _per_page(first)
+            last_page = _last_reply_page(first, max_pages, None, topic.replies) or 1
+            fetched = [first.result]
+            if first.result:
+                fetched.extend(await self._fetch_pages(topic.id, range(2, last_page + 1), revalidate=True))
+            replies = _collect_replies(fetched, None)
+        else:
+            logger.info("Syncing V2EX replies topic=%s pages=%s", topic.id, list(pages))
+            per_page = snapshot.per_page
+            replies = _merge_replies(snapshot.replies, await self._fetch_pages(topic.id, pages, revalidate=True))
+        await asyncio.to_thread(self._save_snapshot, topic, replies, per_page)
+        return replies[: max_pages * per_page]
+
+    async def _walk_replies(
+        self,
+        topic_id: int,
+        first: RepliesViewResponse,
+        max_pages: int,
+        max_replies: Optional[int],
+    ) -> list[ReplyView]:
+        replies: list[ReplyView] = []
+        data = first.result
+        page = 1
+        while data:
+            replies.extend(data)
+            if max_replies is not None and len(replies) >= max_replies:
+                return replies[:max_replies]
+            page += 1
+            if page > max_pages:
+                break
+            data = (await self.fetch_replies_page(topic_id, page)).result
+        return replies
+
+    async def fetch_bundle(self, topic_id: int, max_pages: int) -> tuple[TopicView, list[ReplyView]]:
+        """Fetch the topic and its replies with the topic and first page in parallel."""
+        topic_task = asyncio.ensure_future(self.fetch_topic(topic_id))
+        if max_pages < 1:
+            return await topic_task, []
+        first_task = asyncio.ensure_future(self.fetch_replies_page(topic_id, 1))
+        rest_task: Optional[asyncio.Future[list[Sequence[ReplyView]]]] = None
+        try:
+            done, _ = await asyncio.wait({topic_task, first_task}, return_when=asyncio.FIRST_COMPLETED)
+            # Start the remaining pages from whichever answer arrives first.
+            if first_task in done:
+                pages = _rest_pages(first_task.result(), max_pages, None)
+            else:
+                pages = _speculative_pages(topic_task.result(), max_pages)
+            rest_task = asyncio.ensure_future(self._fetch_pages(topic_id, pages or range(0)))
+            topic = await topic_task
+            first = await first_task
+            expected = _rest_pages(first, max_pages, topic.replies)
+            if expected is None:
+                return topic, await self._walk_replies(topic_id, first, max_pages, None)
+            rest = await rest_task if expected == pages else await self._fetch_pages(topic_id, expected)
+        finally:
+            for task in (topic_task, first_task, rest_task):
+                if task is not None and not task.done():
+                    task.cancel()
+        return topic, _collect_replies([first.result, *rest], None)
+
+    async def iter_bundle_chunks(self, topic_id: int, max_pages: int) -> AsyncIterator[str]:
+        """Yield the bundle while it is fetched: the topic header, then one chunk per reply page.
+
+        Pages are fetched in order with at most ``max_concurrency`` in flight.
+        Joined, the chunks equal ``build_bundle(topic_id, max_pages)``.
+        """
+        trim = TrailingTrim()
+        async for chunk in self._bundle_chunks(topic_id, max_pages):
+            if text := trim.push(chunk):
+                yield text
+
+    async def spool_bundle(self, topic_id: int, max_pages: int, directory: Optional[str] = None) -> BundleSpool:
+        """Format the bundle into a temporary file one page at a time.
+
+        At most ``max_concurrency`` pages are held in memory, however long the
+        thread. Read it back with ``read()`` or ``iter_chunks()`` and close it.
+        """
+        spool = BundleSpool(directory)
+        try:
+            async for chunk in self._bundle_chunks(topic_id, max_pages):
+                spool.write(chunk)
+        except BaseException:
+            spool.close()
+            raise
+        return spool
+
+    async def _bundle_chunks(self, topic_id: int, max_pages: int) -> AsyncIterator[str]:
+        topic_task = asyncio.ensure_future(self.fetch_topic(topic_id))
+        first_task = asyncio.ensure_future(self.fetch_replies_page(topic_id, 1)) if max_pages >= 1 else None
+        try:
+            topic = await topic_task
+            yield self._format_head(topic)
+            first = await first_task if first_task is not None else RepliesViewResponse(success=True)
+        finally:
+            if first_task is not None:
+                first_task.cancel()
+        text, number = self._format_page(first.result, 1)
+        yield text
+        if first.result:
+            pages = _rest_pages(first, max_pages, topic.replies)
+            window = self.max_concurrency
+            if pages is None:
+                # Without pagination metadata, walk pages one by one until an empty one.
+                pages, window = range(2, max_pages + 1), 1
+            async for data in self._iter_pages(topic_id, pages, window):
+                text, number = self._format_page(data, number)
+                yield text
+        if number == 1:
+            yield "No replies."
+
+    async def _iter_pages(self, topic_id: int, pages: range, window: int) -> AsyncIterator[Sequence[ReplyView]]:
+        """Yield reply pages in order with at most ``window`` fetches in flight."""
+        pending = iter(pages)
+        tasks = deque(
+            asyncio.ensure_future(self.fetch_replies_page(topic_id, page)) for page in islice(pending, window)
+        )
+        try:
+            while tasks:
+                data = (await tasks.popleft()).result
+                if not data:
+                    return
+                for page in islice(pending, 1):
+                    tasks.append(asyncio.ensure_future(self.fetch_replies_page(topic_id, page)))
+                yield data
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def build_bundle(self, topic_id: int, max_pages: int, incremental: bool = False) -> str:
+        return self.format_bundle(*await self._load_thread(topic_id, max_pages, incremental))
+
+    async def _load_thread(self, topic_id: int, max_pages: int, incremental: bool) -> tuple[TopicView, list[ReplyView]]:
+        """The topic and its replies, synced against the stored snapshot when ``incremental``."""
+        if not incremental:
+            return await self.fetch_bundle(topic_id, max_pages)
+        topic = await self.fetch_topic(topic_id, revalidate=True)
+        return topic, await self.sync_replies(topic, max_pages)
+
+    async def build_budgeted_bundle(
+        self,
+        topic_id: int,
+        max_pages: int,
+        token_budget: int,
+        counter: Optional[TokenCounter] = None,
+        incremental: bool = False,
+    ) -> tuple[str, BudgetReport]:
+        topic, replies = await self._load_thread(topic_id, max_pages, incremental)
+        return self.format_budgeted_bundle(topic, replies, token_budget, counter)
+
+    async def build_reply_chunks(
+        self,
+        topic_id: int,
+        max_pages: int,
+        chunk_tokens: int,
+        counter: Optional[TokenCounter] = None,
+        incremental: bool = False,
+    ) -> tuple[str, list[str]]:
+        """Return the formatted topic and its replies split by ``format_reply_chunks``."""
+        topic, replies = await self._load_thread(topic_id, max_pages, incremental)
+        return self.format_topic(topic, None), self.format_reply_chunks(replies, chunk_tokens, counter)
+
+    async def build_reply_delta(
+        self,
+        topic_id: int,
+        max_pages: int,
+        after_id: Optional[int],
+        covered: int = 0,
+        incremental: bool = False,
+    ) -> ReplyDelta:
+        """The replies posted after reply ``after_id``, the last of ``covered`` replies already analyzed.
+
+        Without ``after_id`` this is the whole thread, up to ``max_pages``. With
+        it, every page from the one holding reply ``covered`` to the end of the
+        thread is revalidated regardless of ``max_pages``, so new replies past
+        the first pages are not missed.
+        """
+        if after_id is None:
+            topic, replies = await self._load_thread(topic_id, max_pages, incremental)
+            return self.format_reply_delta(topic, replies, None)
+        topic = await self.fetch_topic(topic_id, revalidate=True)
+        pages = _delta_pages(topic, covered)
+        fetched = await self._fetch_pages(topic_id, pages, revalidate=True)
+        replies = [reply for page in fetched for reply in page]
+        return self.format_reply_delta(topic, replies, after_id, (pages.start - 1) * DEFAULT_REPLIES_PER_PAGE)
@@ -0,0 +1,385 @@
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Optional
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_DIR = ".cache/v2ex"
+DEFAULT_TTL = 300.0
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+DEFAULT_ANALYSIS_MAX_BYTES = 16 * 1024 * 1024
+# Page 0 holds the topic endpoint; reply pages use their real page number.
+TOPIC_PAGE = 0
+# Access times of fresh hits are written in batches of this size.
+TOUCH_BATCH = 64
+
+CacheKey = tuple[int, int]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    topic_id INTEGER NOT NULL,
+    page INTEGER NOT NULL,
+    body BLOB NOT NULL,
+    etag TEXT,
+    last_modified TEXT,
+    stored_at REAL NOT NULL,
+    accessed_at REAL NOT NULL,
+    size INTEGER NOT NULL,
+    PRIMARY KEY (topic_id, page)
+);
+CREATE TABLE IF NOT EXISTS threads (
+    topic_id INTEGER PRIMARY KEY,
+    body BLOB NOT NULL,
+    synced_at REAL NOT NULL
+);
+"""
+
+_ANALYSIS_SCHEMA = """
+CREATE TABLE IF NOT EXISTS analyses (
+    key TEXT PRIMARY KEY,
+    topic_id INTEGER NOT NULL,
+    model TEXT NOT NULL,
+    analysis TEXT NOT NULL,
+    stored_at REAL NOT NULL,
+    accessed_at REAL NOT NULL,
+    size INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS latest (
+    topic_id INTEGER PRIMARY KEY,
+    model TEXT NOT NULL,
+    instructions_version TEXT NOT NULL,
+    analysis TEXT NOT NULL,
+    last_reply_id INTEGER,
+    replies INTEGER NOT NULL,
+    stored_at REAL NOT NULL
+);
+"""
+
+
+def _connect(path: str, schema: str) -> sqlite3.Connection:
+    db = sqlite3.connect(path, check_same_thread=False)
+    # WAL with synchronous=NORMAL syncs at checkpoints instead of on every commit.
+    db.execute("PRAGMA journal_mode=WAL")
+    db.execute("PRAGMA synchronous=NORMAL")
+    db.executescript(schema)
+    db.commit()
+    return db
+
+
+@dataclass
+class CacheEntry:
+    body: bytes
+    etag: Optional[str]
+    last_modified: Optional[str]
+    stored_at: float
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    revalidated: int = 0
+    evictions: int = 0
+
+    def summary(self) -> str:
+        total = self.hits + self.misses + self.revalidated
+        served = self.hits + self.revalidated
+        rate = served / total if total else 0.0
+        return (
+            f"hits={self.hits} revalidated={self.revalidated} misses={self.misses} "
+            f"evictions={self.evictions} served_from_cache={rate:.0%}"
+        )
+
+
+@dataclass
+class AnalysisCacheStats:
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+
+    def summary(self) -> str:
+        total = self.hits + self.misses
+        rate = self.hits / total if total else 0.0
+        return f"hits={self.hits} misses={self.misses} evictions={self.evictions} hit_rate={rate:.0%}"
+
+
+@dataclass
+class CacheLookup:
+    key: CacheKey
+    request: httpx.Request
+    entry: Optional[CacheEntry] = None
+    response: Optional[httpx.Response] = None
+    headers: dict[str, str] = field(default_factory=dict)
+
+
+class ResponseCache:
+    """SQLite-backed cache of raw V2EX API bodies keyed by (topic_id, page).
+
+    Entries younger than ``ttl`` are served without touching the network. Older
+    entries are revalidated with If-None-Match / If-Modified-Since, and the
+    store is trimmed back to ``max_bytes`` in least-recently-used order. Access
+    times of fresh hits are buffered and written with the next store, so a
+    hit does not commit.
+    """
+
+    def __init__(
+        self,
+        path: str = os.path.join(DEFAULT_CACHE_DIR, "responses.sqlite3"),
+        ttl: float = DEFAULT_TTL,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+    ) -> None:
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.stats = CacheStats()
+        self._lock = threading.Lock()
+        self._touched: dict[CacheKey, float] = {}
+        self._db = _connect(path, _SCHEMA)
+
+    def close(self) -> None:
+        with self._lock:
+            self._flush_touched()
+            self._db.commit()
+            self._db.close()
+
+    def get(self, key: CacheKey) -> Optional[CacheEntry]:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT body, etag, last_modified, stored_at FROM responses WHERE topic_id = ? AND page = ?",
+                key,
+            ).fetchone()
+        if row is None:
+            return None
+        return CacheEntry(body=row[0], etag=row[1], last_modified=row[2], stored_at=row[3])
+
+    def put(self, key: CacheKey, response: httpx.Response) -> None:
+        body = response.content
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    *key,
+                    body,
+                    response.headers.get("etag"),
+                    response.headers.get("last-modified"),
+                    now,
+                    now,
+                    len(body),
+                ),
+            )
+            self._touched.pop(key, None)
+            self._flush_touched()
+            self._evict()
+            self._db.commit()
+
+    def load_thread(self, topic_id: int) -> Optional[bytes]:
+        """Return the serialized reply snapshot kept for incremental sync."""
+        with self._lock:
+            row = self._db.execute("SELECT body FROM threads WHERE topic_id = ?", (topic_id,)).fetchone()
+        return row[0] if row is not None else None
+
+    def save_thread(self, topic_id: int, body: bytes) -> None:
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO threads VALUES (?, ?, ?)",
+                (topic_id, body, time.time()),
+            )
+            self._db.commit()
+
+    def lookup(self, key: CacheKey, request: httpx.Request, revalidate: bool = False) -> CacheLookup:
+        """Serve a fresh entry, or prepare conditional headers for the network request.
+
+        ``revalidate`` skips the TTL shortcut so callers that know the upstream
+        changed still get a 304 when nothing did.
+        """
+        lookup = CacheLookup(key=key, request=request, entry=self.get(key))
+        entry = lookup.entry
+        if entry is None:
+            return lookup
+        if not revalidate and time.time() - entry.stored_at < self.ttl:
+            self._touch(key, refresh=False)
+            logger.debug("V2EX cache hit topic=%s page=%s", *key)
+            lookup.response = self._replay(entry, request)
+            return lookup
+        if entry.etag:
+            lookup.headers["If-None-Match"] = entry.etag
+        if entry.last_modified:
+            lookup.headers["If-Modified-Since"] = entry.last_modified
+        return lookup
+
+    def resolve(self, lookup: CacheLookup, response: httpx.Response) -> httpx.Response:
+        if response.status_code == httpx.codes.NOT_MODIFIED and lookup.entry is not None:
+            self._touch(lookup.key, refresh=True)
+            logger.debug("V2EX cache revalidated topic=%s page=%s", *lookup.key)
+            return self._replay(lookup.entry, lookup.request)
+        with self._lock:
+            self.stats.misses += 1
+        if response.status_code == httpx.codes.OK:
+            self.put(lookup.key, response)
+        return response
+
+    def _touch(self, key: CacheKey, refresh: bool) -> None:
+        # A refresh is a 304 revalidation and restarts the TTL; otherwise this is a fresh hit.
+        now = time.time()
+        with self._lock:
+            if refresh:
+                self.stats.revalidated += 1
+                self._touched.pop(key, None)
+                self._db.execute(
+                    "UPDATE responses SET accessed_at = ?, stored_at = ? WHERE topic_id = ? AND page = ?",
+                    (now, now, *key),
+                )
+                self._db.commit()
+            else:
+                self.stats.hits += 1
+                self._touched[key] = now
+                if len(self._touched) >= TOUCH_BATCH:
+                    self._flush_touched()
+                    self._db.commit()
+
+    def _flush_touched(self) -> None:
+        if not self._touched:
+            return
+        self._db.executemany(
+            "UPDATE responses SET accessed_at = ? WHERE topic_id = ? AND page = ?",
+            [(accessed_at, *key) for key, accessed_at in self._touched.items()],
+        )
+        self._touched.clear()
+
+    def _evict(self) -> None:
+        total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        rows = self._db.execute("SELECT topic_id, page, size FROM responses ORDER BY accessed_at").fetchall()
+        for topic_id, page, size in rows:
+            if total <= self.max_bytes:
+                break
+            self._db.execute("DELETE FROM responses WHERE topic_id = ? AND page = ?", (topic_id, page))
+            total -= size
+            self.stats.evictions += 1
+
+    @staticmethod
+    def _replay(entry: CacheEntry, request: httpx.Request) -> httpx.Response:
+        headers: dict[str, Any] = {"content-type": "application/json"}
+        if entry.etag:
+            headers["etag"] = entry.etag
+        if entry.last_modified:
+            headers["last-modified"] = entry.last_modified
+        return httpx.Response(httpx.codes.OK, content=entry.body, headers=headers, request=request)
+
+
+@dataclass
+class StoredAnalysis:
+    analysis: str
+    model: str
+    instructions_version: str
+    last_reply_id: Optional[int]
+    replies: int
+    stored_at: float
+
+
+def analysis_key(material: str, model: str, instructions_version: str) -> str:
+    """Content address of an analysis: what the model read, which model, and which instructions."""
+    digest = hashlib.sha256()
+    for part in (instructions_version, model, material):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class AnalysisCache:
+    """SQLite-backed store of finished analyses keyed by ``analysis_key``.
+
+    A changed bundle, model or prompt gives a new key, so entries never need
+    invalidating; the store is trimmed back to ``max_bytes`` in
+    least-recently-used order. The newest analysis of each topic is also kept,
+    outside that bound, as the base for delta updates.
+    """
+
+    def __init__(
+        self,
+        path: str = os.path.join(DEFAULT_CACHE_DIR, "analyses.sqlite3"),
+        max_bytes: int = DEFAULT_ANALYSIS_MAX_BYTES,
+    ) -> None:
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.max_bytes = max_bytes
+        self.stats = AnalysisCacheStats()
+        self._lock = threading.Lock()
+        self._db = _connect(path, _ANALYSIS_SCHEMA)
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._db.execute("SELECT analysis FROM analyses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.stats.misses += 1
+                return None
+            self.stats.hits += 1
+            self._db.execute("UPDATE analyses SET accessed_at = ? WHERE key = ?", (time.time(), key))
+            self._db.commit()
+        return row[0]
+
+    def put(self, key: str, topic_id: int, model: str, analysis: str) -> None:
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO analyses VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, topic_id, model, analysis, now, now, len(analysis.encode("utf-8"))),
+            )
+            self._evict()
+            self._db.commit()
+
+    def load_latest(self, topic_id: int) -> Optional[StoredAnalysis]:
+        """Return the newest analysis of ``topic_id`` kept for delta updates."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT analysis, model, instructions_version, last_reply_id, replies, stored_at "
+                "FROM latest WHERE topic_id = ?",
+                (topic_id,),
+            ).fetchone()
+        return StoredAnalysis(*row) if row is not None else None
+
+    def save_latest(self, topic_id: int, stored: StoredAnalysis) -> None:
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO latest VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    topic_id,
+                    stored.model,
+                    stored.instructions_version,
+                    stored.analysis,
+                    stored.last_reply_id,
+                    stored.replies,
+                    stored.stored_at,
+                ),
+            )
+            self._db.commit()
+
+    def _evict(self) -> None:
+        total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM analyses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        rows = self._db.execute("SELECT key, size FROM analyses ORDER BY accessed_at").fetchall()
+        for key, size in rows:
+            if total <= self.max_bytes:
+                break
+            self._db.execute("DELETE FROM analyses WHERE key = ?", (key,))
+            total -= size
+            self.stats.evictions += 1
@@ -0,0 +1,158 @@
+import logging
+import math
+import threading
+import time
+from collections.abc import Mapping
+from dataclasses import dataclass
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+# V2EX API v2 allows 600 requests per hour by default.
+DEFAULT_LIMIT = 600
+DEFAULT_WINDOW = 3600.0
+DEFAULT_MAX_WAIT = 120.0
+PROBE_WAIT = 0.05
+
+
+@dataclass
+class QuotaSnapshot:
+    limit: int
+    remaining: Optional[int]
+    tokens: float
+    reset_in: Optional[float]
+    waited: float
+    throttled: int
+
+    def summary(self) -> str:
+        remaining = "?" if self.remaining is None else str(self.remaining)
+        reset_in = "?" if self.reset_in is None else f"{self.reset_in:.0f}s"
+        return (
+            f"limit={self.limit} remaining={remaining} tokens={self.tokens:.1f} "
+            f"reset_in={reset_in} waited={self.waited:.2f}s throttled={self.throttled}"
+        )
+
+
+def _int_header(headers: Mapping[str, str], name: str) -> Optional[int]:
+    value = headers.get(name)
+    if value is None:
+        return None
+    try:
+        return int(float(value))
+    except ValueError:
+        return None
+
+
+class RateLimiter:
+    """Token bucket shared by every request a client (or several clients) makes.
+
+    The bucket starts at ``burst`` tokens and refills at ``limit / window``. Once
+    V2EX reports X-Rate-Limit-Remaining / X-Rate-Limit-Reset, tokens are capped
+    at what the server still allows minus requests in flight, and the refill
+    rate spreads the rest of that quota over the time left until reset, so
+    concurrent callers are paced instead of running into 429. The first
+    ``burst`` requests go out without waiting for those headers, so a fan-out
+    is not serialized behind the first response.
+    """
+
+    def __init__(
+        self,
+        limit: int = DEFAULT_LIMIT,
+        window: float = DEFAULT_WINDOW,
+        burst: Optional[int] = None,
+        max_wait: float = DEFAULT_MAX_WAIT,
+    ) -> None:
+        self.limit = limit
+        self.window = window
+        self.capacity = float(burst if burst is not None else limit)
+        self.max_wait = max_wait
+        self._lock = threading.Lock()
+        self._rate = limit / window
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._reset_at: Optional[float] = None
+        self._reset_header: Optional[int] = None
+        self._remaining: Optional[int] = None
+        self._in_flight = 0
+        self._waited = 0.0
+        self._throttled = 0
+
+    def _refill(self, now: float) -> None:
+        if self._reset_at is not None and now >= self._reset_at:
+            # The server window rolled over and restored the full quota.
+            self._tokens = min(self.capacity, float(self.limit))
+            self._rate = self.limit / self.window
+            self._reset_at = None
+            self._remaining = None
+        else:
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self._rate)
+        self._updated = now
+
+    def try_acquire(self) -> float:
+        """Take a token and return 0, or return how long to sleep before trying again."""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            if self._tokens >= 1:
+                self._tokens -= 1
+                self._in_flight += 1
+                return 0.0
+            else:
+                delay = (1 - self._tokens) / self._rate if self._rate > 0 else math.inf
+                if self._reset_at is not None:
+                    delay = min(delay, max(self._reset_at - now, PROBE_WAIT))
+                if delay > self.max_wait:
+                    raise RuntimeError(f"V2EX rate limit exhausted; quota resets in {delay:.0f}s")
+            self._waited += delay
+            return delay
+
+    def release(self) -> None:
+        """Drop an in-flight request that never got a response."""
+        with self._lock:
+            self._in_flight = max(0, self._in_flight - 1)
+
+    def update(self, headers: Mapping[str, str], status_code: int) -> None:
+        with self._lock:
+            now = time.monotonic()
+            self._in_flight = max(0, self._in_flight - 1)
+            limit = _int_header(headers, "x-rate-limit-limit")
+            remaining = _int_header(headers, "x-rate-limit-remaining")
+            reset = _int_header(headers, "x-rate-limit-reset")
+            if status_code == 429:
+                self._throttled += 1
+                remaining = 0
+                retry_after = _int_header(headers, "retry-after")
+                if retry_after is not None:
+                    reset = int(time.time()) + retry_after
+            if limit:
+                self.limit = limit
+            if reset is not None:
+                if reset == self._reset_header and remaining is not None and self._remaining is not None:
+                    # Responses can arrive out of order; within one window the
+                    # smallest remaining count is the most recent one.
+                    remaining = min(remaining, self._remaining)
+                self._reset_header = reset
+                self._reset_at = now + max(0.0, reset - time.time())
+            if remaining is None:
+                return
+            self._refill(now)
+            self._remaining = remaining
+            allowed = max(0, remaining - self._in_flight)
+            self._tokens = min(self.capacity, float(allowed))
+            if self._reset_at is not None:
+                self._rate = (allowed - self._tokens) / max(self._reset_at - now, 1.0)
+            if remaining == 0:
+                logger.warning("V2EX rate limit exhausted; pausing requests until reset")
+
+    def quota(self) -> QuotaSnapshot:
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            return QuotaSnapshot(
+                limit=self.limit,
+                remaining=self._remaining,
+                tokens=self._tokens,
+                reset_in=None if self._reset_at is None else max(0.0, self._reset_at - now),
+                waited=self._waited,
+                throttled=self._throttled,
+            )
@@ -0,0 +1,139 @@
+import logging
+import random
+import threading
+from collections import deque
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Optional
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+RETRYABLE_STATUSES = frozenset({429, 500, 502, 503, 504})
+DEFAULT_LOG_SIZE = 10000
+# Hedge thresholds follow recent latency, not the whole history.
+HEDGE_WINDOW = 1000
+
+
+def _retry_after(response: Optional[httpx.Response]) -> Optional[float]:
+    if response is None:
+        return None
+    value = response.headers.get("retry-after")
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+
+def _quantile(samples: list[float], q: float) -> float:
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(q * (len(ordered) - 1))))
+    return ordered[index]
+
+
+@dataclass
+class Attempt:
+    url: str
+    attempt: int
+    hedged: bool
+    elapsed: float
+    status: Optional[int] = None
+    error: Optional[str] = None
+
+
+class AttemptLog:
+    """Bounded record of every HTTP attempt plus end-to-end request latency."""
+
+    def __init__(self, size: int = DEFAULT_LOG_SIZE) -> None:
+        self._lock = threading.Lock()
+        self.attempts: deque[Attempt] = deque(maxlen=size)
+        self.requests: deque[float] = deque(maxlen=size)
+
+    def record(self, attempt: Attempt) -> None:
+        with self._lock:
+            self.attempts.append(attempt)
+
+    def record_request(self, elapsed: float) -> None:
+        with self._lock:
+            self.requests.append(elapsed)
+
+    def attempt_quantile(self, q: float, min_samples: int) -> Optional[float]:
+        with self._lock:
+            recent = list(self.attempts)[-HEDGE_WINDOW:]
+        samples = [a.elapsed for a in recent if a.status is not None and a.status < 400]
+        if len(samples) < min_samples:
+            return None
+        return _quantile(samples, q)
+
+    def summary(self) -> str:
+        with self._lock:
+            attempts = list(self.attempts)
+            requests = list(self.requests)
+        if not requests:
+            return "no requests"
+        retries = sum(1 for a in attempts if a.attempt > 1 and not a.hedged)
+        hedges = sum(1 for a in attempts if a.hedged)
+        failures = sum(
+            1 for a in attempts if (a.error is not None and a.error != "CancelledError") or (a.status or 0) >= 400
+        )
+        return (
+            f"requests={len(requests)} attempts={len(attempts)} retries={retries} hedges={hedges} "
+            f"failed_attempts={failures} p50={_quantile(requests, 0.5):.3f}s "
+            f"p95={_quantile(requests, 0.95):.3f}s p99={_quantile(requests, 0.99):.3f}s"
+        )
+
+
+@dataclass
+class RetryPolicy:
+    """Retry and hedging settings for idempotent V2EX GETs.
+
+    Backoff is exponential with full jitter and never shorter than a server
+    Retry-After, though both are capped at ``backoff_max``; longer server
+    pauses are left to the rate limiter, which reads Retry-After on 429.
+    With ``hedge_quantile`` set, a duplicate request is sent once the
+    primary has been outstanding longer than that quantile of recent
+    successful attempts (or ``hedge_after`` seconds, if given).
+    """
+
+    max_attempts: int = 3
+    backoff_base: float = 0.5
+    backoff_max: float = 30.0
+    retry_statuses: frozenset[int] = RETRYABLE_STATUSES
+    hedge_quantile: Optional[float] = None
+    hedge_after: Optional[float] = None
+    hedge_min_samples: int = 20
+
+    def retry_delay(
+        self,
+        attempt: int,
+        response: Optional[httpx.Response] = None,
+        error: Optional[Exception] = None,
+    ) -> Optional[float]:
+        """Seconds to wait before the next attempt, or None when the result is final."""
+        if attempt >= self.max_attempts:
+            return None
+        if error is None and (response is None or response.status_code not in self.retry_statuses):
+            return None
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** (attempt - 1)))
+        retry_after = _retry_after(response)
+        if retry_after is not None:
+            delay = max(delay, min(retry_after, self.backoff_max))
+        reason = error if error is not None else f"status {response.status_code if response else '?'}"
+        logger.warning("V2EX request failed (%s); retry %s/%s in %.2fs", reason, attempt, self.max_attempts - 1, delay)
+        return delay
+
+    def hedge_delay(self, log: AttemptLog) -> Optional[float]:
+        if self.hedge_after is not None:
+            return self.hedge_after
+        if self.hedge_quantile is None:
+            return None
+        return log.attempt_quantile(self.hedge_quantile, self.hedge_min_samples)
@@ -0,0 +1,63 @@
+import tempfile
+from collections.abc import Iterator
+from types import TracebackType
+from typing import Optional
+
+DEFAULT_CHUNK_CHARS = 64 * 1024
+
+
+class TrailingTrim:
+    """Holds back trailing whitespace so chunked text ends the way ``str.rstrip`` would."""
+
+    def __init__(self) -> None:
+        self._pending = ""
+
+    def push(self, text: str) -> str:
+        """Return what can be emitted now; whitespace that may be trailing is kept back."""
+        text = self._pending + text
+        body = text.rstrip()
+        self._pending = text[len(body) :]
+        return body
+
+
+class BundleSpool:
+    """Formatted bundle text kept in a temporary file instead of in memory.
+
+    Writers append text page by page; readers stream it back in chunks once
+    writing is done. Trailing whitespace of the whole spool is dropped on read,
+    matching the strip ``format_bundle`` applies to the joined string.
+    """
+
+    def __init__(self, directory: Optional[str] = None) -> None:
+        self._file = tempfile.TemporaryFile(mode="w+", encoding="utf-8", newline="", dir=directory)
+        self.chars = 0
+
+    def __enter__(self) -> "BundleSpool":
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Optional[type[BaseException]],
+        exc: Optional[BaseException],
+        tb: Optional[TracebackType],
+    ) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self._file.close()
+
+    def write(self, text: str) -> None:
+        self._file.write(text)
+        self.chars += len(text)
+
+    def iter_chunks(self, size: int = DEFAULT_CHUNK_CHARS) -> Iterator[str]:
+        self._file.flush()
+        self._file.seek(0)
+        trim = TrailingTrim()
+        while chunk := self._file.read(size):
+            if text := trim.push(chunk):
+                yield text
+        self._file.seek(0, 2)
+
+    def read(self) -> str:
+        return "".join(self.iter_chunks())
@@ -0,0 +1,84 @@
+import json
+import re
+
+# A whole string token, a bracket, or a lone quote when the string is still incomplete.
+_TOKEN = re.compile(rb'"[^"\\]*(?:\\.[^"\\]*)*"|[\[\]{}]|"', re.DOTALL)
+
+
+class JsonArraySplitter:
+    """Splits one top-level array of a streamed JSON object into raw elements.
+
+    ``feed`` takes response chunks and returns the bytes of every array element
+    completed so far, so only the element being read stays buffered. Everything
+    outside the array is kept as a small skeleton document with the array
+    emptied, which ``close`` returns for parsing the envelope.
+    """
+
+    def __init__(self, key: str = "result") -> None:
+        self._key = json.dumps(key).encode("utf-8")
+        self._buf = bytearray()
+        self._pos = 0
+        self._depth = 0
+        self._last_string = b""
+        self._in_array = False
+        self._seen_array = False
+        self._element_start = -1
+        self._kept = 0
+        self._skeleton = bytearray()
+
+    def feed(self, chunk: bytes) -> list[bytes]:
+        buf = self._buf
+        buf += chunk
+        elements: list[bytes] = []
+        pos = self._pos
+        depth = self._depth
+        search = _TOKEN.search
+        while (match := search(buf, pos)) is not None:
+            start, end = match.span()
+            char = buf[start]
+            if char == 0x22:  # quote
+                if end - start == 1:
+                    break
+                if depth == 1:
+                    self._last_string = match.group()
+            elif char == 0x5B or char == 0x7B:  # [ or {
+                if depth == 1 and char == 0x5B and not self._seen_array and self._last_string == self._key:
+                    self._in_array = self._seen_array = True
+                    self._skeleton += buf[self._kept : end]
+                elif depth == 2 and self._in_array:
+                    self._element_start = start
+                depth += 1
+            else:
+                depth -= 1
+                if self._in_array and depth == 2 and self._element_start >= 0:
+                    elements.append(bytes(buf[self._element_start : end]))
+                    self._element_start = -1
+                elif self._in_array and depth == 1:
+                    self._in_array = False
+                    self._kept = start
+            pos = end
+        else:
+            pos = len(buf)
+        self._pos = pos
+        self._depth = depth
+        self._compact()
+        return elements
+
+    def _compact(self) -> None:
+        if not self._in_array:
+            self._skeleton += self._buf[self._kept : self._pos]
+            self._kept = self._pos
+        drop = self._element_start if self._element_start >= 0 else self._pos
+        if drop <= 0:
+            return
+        del self._buf[:drop]
+        self._pos -= drop
+        self._kept = max(0, self._kept - drop)
+        if self._element_start >= 0:
+            self._element_start -= drop
+
+    def close(self) -> bytes:
+        """Return the document without the array's elements."""
+        if self._depth != 0 or self._in_array or self._pos < len(self._buf.strip()):
+            raise ValueError("JSON stream ended mid-document")
+        return bytes(self._skeleton)
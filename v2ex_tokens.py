@@ -0,0 +1,73 @@
+import logging
+import math
+import re
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ENCODING = "o200k_base"
+CHARS_PER_TOKEN = 4.0
+# Kana, CJK ideographs and extension A, Hangul, compatibility ideographs and fullwidth forms.
+_WIDE = re.compile("[\u3000-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff\uff00-\uffef]")
+
+
+def estimate_tokens(text: str) -> int:
+    """Fast estimate: one token per CJK character, CHARS_PER_TOKEN characters per token otherwise."""
+    wide = len(_WIDE.findall(text))
+    return wide + math.ceil((len(text) - wide) / CHARS_PER_TOKEN)
+
+
+@lru_cache(maxsize=None)
+def _load_encoding(model: Optional[str]) -> Any:
+    try:
+        import tiktoken  # type: ignore[import-not-found]
+    except ImportError:
+        logger.debug("tiktoken is not installed; estimating token counts")
+        return None
+    try:
+        return tiktoken.encoding_for_model(model) if model else tiktoken.get_encoding(DEFAULT_ENCODING)
+    except KeyError:
+        return tiktoken.get_encoding(DEFAULT_ENCODING)
+    except Exception as exc:
+        logger.warning("tiktoken encoding unavailable (%s); estimating token counts", exc)
+        return None
+
+
+class TokenCounter:
+    """Counts tokens exactly with tiktoken when it is installed, otherwise estimates them."""
+
+    def __init__(self, model: Optional[str] = None) -> None:
+        self.model = model
+        self._encoding = _load_encoding(model)
+
+    @property
+    def exact(self) -> bool:
+        return self._encoding is not None
+
+    def count(self, text: str) -> int:
+        if self._encoding is None:
+            return estimate_tokens(text)
+        return len(self._encoding.encode(text, disallowed_special=()))
+
+
+@dataclass
+class BudgetReport:
+    budget: int
+    used: int
+    replies_total: int
+    replies_kept: int
+    topic_truncated: bool
+    exact: bool
+
+    @property
+    def replies_dropped(self) -> int:
+        return self.replies_total - self.replies_kept
+
+    def summary(self) -> str:
+        return (
+            f"budget={self.budget} used={self.used} replies_kept={self.replies_kept}/{self.replies_total} "
+            f"dropped={self.replies_dropped} topic_truncated={self.topic_truncated} "
+            f"tokenizer={'exact' if self.exact else 'estimate'}"
+        )